@@ -1,6 +1,6 @@
 from flask import Flask, request, jsonify, render_template
 from flask import Flask, render_template, request, redirect, make_response, Response
-import os, json
+import os, json, math, time
 from flask_cors import CORS
 from datetime import datetime, timedelta
 from config import get_ngrok_url
@@ -12,6 +12,9 @@ from urllib.parse import urlparse
 from lights import get_lights
 import requests
 from weather_source import get_weather
+from json_store import store
+from storage import open_storage
+from tap_journal import parse_ring, ring_iso
 
 L = get_lights()
 
@@ -27,9 +30,14 @@ FAVORITES_FILE = "favorites.json"
 REMOVED_FILE = "removed.json"
 STATIC_BASE = "https://ostrich-pretty-lab.ngrok.app".rstrip("/")
 MISSYOU_FILE = "missyou.json"
+CURRENT_POEM_FILE = "current_poem.json"
 
-# If L has real pixels, we’re on the Pi. Otherwise we’re on Render.
-RUN_LOCAL = hasattr(L, "pixels")
+# poems, reminders, favorites/removed and miss-you clicks (JSON files or SQLite, see storage.py)
+storage = open_storage(poems=POEMS_FILE, reminders=REMINDERS_FILE, favorites=FAVORITES_FILE,
+	removed=REMOVED_FILE, missyou=MISSYOU_FILE)
+
+# If L has real pixels (or talks to the lights daemon), we’re on the Pi. Otherwise we’re on Render.
+RUN_LOCAL = hasattr(L, "pixels") or getattr(L, "remote", False)
 
 
 def _forward_to_pi(path: str, payload: dict | None = None):
@@ -84,20 +92,6 @@ def home():
 	}
 	return Response(html, status=503, headers=headers)
 
-def _append_json(path, obj):
-	try:
-		with open(path, "r", encoding="utf-8") as f:
-			arr = json.load(f)
-			if not isinstance(arr, list):
-				arr = []
-	except FileNotFoundError:
-		arr = []
-	except Exception:
-		arr = []
-	arr.append(obj)
-	with open(path, "w", encoding="utf-8") as f:
-		json.dump(arr, f, ensure_ascii=False, indent=2)
-
 # ---- Flowers config ----
 FLOWER_FOLDER = os.path.join(os.path.dirname(__file__), "static", "flowers")
 os.makedirs(FLOWER_FOLDER, exist_ok=True)
@@ -118,15 +112,13 @@ def _list_flowers_from_disk():
 	return items
 
 def _load_flower_state():
-	try:
-		with open(FLOWER_STATE_PATH, "r", encoding="utf-8") as f:
-			return json.load(f)
-	except Exception:
+	state = store.get(FLOWER_STATE_PATH, check=lambda d: isinstance(d, dict))
+	if state is None:
 		return {"index": 0, "changed_at": datetime.now(TZ_NY).isoformat()}
+	return dict(state)
 
 def _save_flower_state(state):
-	with open(FLOWER_STATE_PATH, "w", encoding="utf-8") as f:
-		json.dump(state, f, indent=2)
+	store.save(FLOWER_STATE_PATH, state, indent=2)
 
 def _next_wed_9am(after_dt):
 	dt = after_dt.astimezone(TZ_NY)
@@ -153,15 +145,7 @@ def _maybe_rotate_weekly(state, now_et):
 	return state
 
 def load_reminders():
-	try:
-		with open(REMINDERS_FILE, "r") as f:
-			return json.load(f)
-	except FileNotFoundError:
-		return []
-
-def save_reminders(reminders):
-	with open(REMINDERS_FILE, "w") as f:
-		json.dump(reminders, f)
+	return storage.reminders()
 
 @app.route("/flowers", methods=["GET"])
 def flowers_page():
@@ -236,26 +220,16 @@ def flower_upload():
 def poems():
 	poems = load_poems()
 	override = get_override_message()
-
-	try:
-		with open("current_poem.json", "r", encoding="utf-8") as f:
-			current_poem = json.load(f)
-	except FileNotFoundError:
-		current_poem = None
-
 	return render_template("poems.html", poems=poems, override=override)
 
 @app.route('/override')
 def get_override():
-	with open('poem_override.json', 'r') as f:
-		data = json.load(f)
-	return jsonify(data)
+	return jsonify(store.get(OVERRIDE_FILE, {"override": ""}))
 
 @app.route("/clear_override", methods=["POST"])
 def clear_override():
 	try:
-		with open(OVERRIDE_FILE, "w") as f:
-			json.dump({"override": ""}, f)
+		set_override_message("")
 
 		# turn lights off
 		if RUN_LOCAL and hasattr(L, "off"):
@@ -288,12 +262,10 @@ def add_poem():
 			return jsonify({"error": "Poem text is required."}), 400
 		return redirect("/poems")
 
-	poems = load_poems()
-	poems.append({"text": text, "author": author, "display": display})
-	save_poems(poems)
+	count = storage.add_poem(text, author, display)
 
 	if request.is_json:
-		return jsonify({"status": "ok", "count": len(poems)}), 201
+		return jsonify({"status": "ok", "count": count}), 201
 	return redirect("/poems")
 
 # Optional: JSON-friendly alias you can call from curl or the app
@@ -302,43 +274,29 @@ def poems_add():
 	return add_poem()
 
 def load_poems():
-	try:
-		with open(POEMS_FILE, "r", encoding="utf-8") as f:
-			data = json.load(f)
-			return data if isinstance(data, list) else []
-	except FileNotFoundError:
-		return []
-	except Exception as e:
-		print("load_poems error:", e)
-		return []
-
-def save_poems(poems):
-	# atomic write to avoid corrupting the file on crash
-	tmp = POEMS_FILE + ".tmp"
-	with open(tmp, "w", encoding="utf-8") as f:
-		json.dump(poems, f, ensure_ascii=False, indent=2)
-	os.replace(tmp, POEMS_FILE)
+	return storage.poems()
 
 def set_override_message(msg):
-	with open(OVERRIDE_FILE, "w") as f:
-		json.dump({"override": msg}, f)
+	store.save(OVERRIDE_FILE, {"override": msg})
 
 def get_override_message():
-	try:
-		with open(OVERRIDE_FILE, "r") as f:
-			return json.load(f).get("override", "")
-	except:
-		return ""
+	data = store.get(OVERRIDE_FILE, {})
+	return data.get("override", "") if isinstance(data, dict) else ""
+
+def load_current_poem():
+	"""The poem the mirror is showing (it writes current_poem.json), or None."""
+	return store.get(CURRENT_POEM_FILE, check=lambda d: isinstance(d, dict))
 
 @app.route("/favorite_poem", methods=["POST"])
 def favorite_poem():
 	try:
 		# read the poem currently on screen
-		with open("current_poem.json", "r", encoding="utf-8") as f:
-			current_poem = json.load(f)
+		current_poem = load_current_poem()
+		if current_poem is None:
+			raise FileNotFoundError(CURRENT_POEM_FILE)
 
-		# stash in favorites.json (list)
-		_append_json(FAVORITES_FILE, current_poem)
+		# stash in the favorites history
+		storage.log("favorites", current_poem)
 
 		# back to the poems page (or return JSON if you prefer)
 		return redirect("/poems")
@@ -346,36 +304,34 @@ def favorite_poem():
 		return f"Error favoriting poem: {e}", 500
 
 
+@app.route("/poems/history/<kind>", methods=["GET"])
+def poem_history(kind):
+	"""Favorites or removed history, a page at a time: ?offset=0&limit=50 (oldest first)."""
+	if kind not in ("favorites", "removed"):
+		return jsonify({"error": "history is favorites or removed"}), 404
+	try:
+		offset = max(0, int(request.args.get("offset", 0)))
+		limit = max(0, min(int(request.args.get("limit", 50)), 500))
+	except ValueError:
+		return jsonify({"error": "offset and limit must be integers"}), 400
+	return jsonify({"offset": offset, "entries": storage.log_page(kind, offset, limit)})
+
+
 @app.route("/remove_poem", methods=["POST"])
 def remove_poem():
 	try:
 		# poem currently showing
-		with open("current_poem.json", "r", encoding="utf-8") as f:
-			current_poem = json.load(f)
-
-		# load poems list
-		with open("poems.json", "r", encoding="utf-8") as f:
-			poems = json.load(f)
-			if not isinstance(poems, list):
-				poems = []
+		current_poem = load_current_poem()
+		if current_poem is None:
+			raise FileNotFoundError(CURRENT_POEM_FILE)
 
 		# locate a matching poem and set display=False
 		ct = current_poem.get("text", "").strip()
 		ca = current_poem.get("author", "").strip()
+		storage.hide_poem(ct, ca)
 
-		changed = False
-		for p in poems:
-			if p.get("text", "").strip() == ct and p.get("author", "").strip() == ca:
-				p["display"] = False
-				changed = True
-				break
-
-		if changed:
-			with open("poems.json", "w", encoding="utf-8") as f:
-				json.dump(poems, f, ensure_ascii=False, indent=2)
-
-		# also log it in removed.json (optional, useful history)
-		_append_json(REMOVED_FILE, current_poem)
+		# also log it in the removed history (optional, useful history)
+		storage.log("removed", current_poem)
 
 		return redirect("/poems")
 	except Exception as e:
@@ -385,13 +341,14 @@ def remove_poem():
 @app.route("/current_poem")
 def current_poem():
     try:
-        with open("current_poem.json", "r", encoding="utf-8") as f:
-            poem_data = json.load(f)
-            text = poem_data.get("text", "").strip()
-            author = poem_data.get("author", "Unknown")
-            response = jsonify({"text": text, "author": author})
-            
-            return response
+        poem_data = load_current_poem()
+        if poem_data is None:
+            raise FileNotFoundError(CURRENT_POEM_FILE)
+        text = poem_data.get("text", "").strip()
+        author = poem_data.get("author", "Unknown")
+        response = jsonify({"text": text, "author": author})
+        
+        return response
     except Exception as e:
         error_response = jsonify({"error": f"Error loading poem: {e}"})
         print("Current directory:", os.getcwd())
@@ -404,46 +361,19 @@ def current_poem():
 def missyou():
 	return render_template("missyou.html")
 
-def _ensure_parent_dir(path):
-	# (keeps things safe even if you later move the file)
-	Path(path).parent.mkdir(parents=True, exist_ok=True)
-
 def load_missyou_data():
 	"""Always return a dict with keys: clicks (int), rings (list of ISO UTC strings)."""
-	try:
-		with open(MISSYOU_FILE, "r", encoding="utf-8") as f:
-			data = json.load(f)
-			if not isinstance(data, dict):
-				raise ValueError("bad shape")
-			data.setdefault("clicks", 0)
-			data.setdefault("rings", [])
-			return data
-	except Exception:
-		# File missing or corrupt -> start fresh
-		return {"clicks": 0, "rings": []}
-
-def save_missyou_data(data):
-	"""Persist safely."""
-	_ensure_parent_dir(MISSYOU_FILE)
-	with open(MISSYOU_FILE, "w", encoding="utf-8") as f:
-		json.dump(data, f, ensure_ascii=False, indent=2)
+	return storage.missyou()
 
 @app.route("/missyou/tap", methods=["POST"])
 def tap_heart():
-	data = load_missyou_data()
-
-	# Bump clicks
-	data["clicks"] = int(data.get("clicks", 0)) + 1
+	# Bump clicks; every 10 clicks the storage adds a ring timestamp
+	clicks, rings, ring = storage.tap()
 
 	fired = False
 
-	# Every 10 clicks -> add a ring timestamp AND trigger a one-shot heartbeat
-	if data["clicks"] % 10 == 0:
-		now = datetime.utcnow().replace(microsecond=0).isoformat() + "Z"
-		data["rings"].append(now)
-		if len(data["rings"]) > 200:
-			data["rings"] = data["rings"][-200:]
-
+	# ... AND we trigger a one-shot heartbeat
+	if ring:
 		try:
 			if RUN_LOCAL and hasattr(L, "heart_pulse"):
 				# We are on the Pi -> call the one-shot animation directly
@@ -455,41 +385,57 @@ def tap_heart():
 		except Exception as e:
 			print("lights/heart error:", e)
 
-	save_missyou_data(data)
-
 	return jsonify({
-		"clicks": data["clicks"],
-		"rings": len(data.get("rings", [])),
+		"clicks": clicks,
+		"rings": rings,
 		"fired": fired
 	})
 
 
+ACTIVE_RING_WINDOW = 30 * 60 # seconds a ring stays 'active' on the mirror
+
+MAX_EPOCH = 253402300799 # 9999-12-31T23:59:59Z, the last second datetime (ring_iso) can show
+
+def _time_arg(name):
+	"""Query arg as epoch seconds (0 .. MAX_EPOCH): a number or an ISO UTC timestamp; None if absent."""
+	value = request.args.get(name)
+	if value in (None, ""):
+		return None
+	try:
+		sec = float(value)
+	except ValueError:
+		sec = parse_ring(value)
+	if sec is None or not 0 <= sec <= MAX_EPOCH: # also rejects "inf" / "nan", which float() takes
+		raise ValueError(f"bad {name}: {value!r} (epoch seconds or ISO UTC)")
+	return sec
+
 @app.route("/missyou/status")
 def missyou_status():
-	"""Return how many rings are still 'active' (<= 30 minutes old)."""
+	"""
+	How many rings are still 'active' (<= 30 minutes old, or ?window=seconds),
+	or how many fell in a historical range: ?start=...&end=... (epoch seconds or ISO UTC).
+	"""
 	try:
-		data = load_missyou_data()
-		now = datetime.utcnow()
-		active = 0
-		for ts in data.get("rings", []):
-			try:
-				# accept both "...Z" and "...Z.sss"
-				ts_clean = ts.replace("Z", "")
-				if "." in ts_clean:
-					ts_clean = ts_clean.split(".", 1)[0]
-				ring_time = datetime.fromisoformat(ts_clean)
-				if (now - ring_time).total_seconds() <= 30 * 60:
-					active += 1
-			except Exception:
-				continue
-		return jsonify({"active_rings": active})
+		start, end = _time_arg("start"), _time_arg("end")
+		if start is not None or end is not None:
+			return jsonify({"rings": storage.ring_count(start or 0, end),
+				"start": ring_iso(start or 0), "end": ring_iso(end) if end is not None else None})
+		window = float(request.args.get("window", ACTIVE_RING_WINDOW))
+		if not math.isfinite(window):
+			raise ValueError(f"bad window: {window!r} (seconds)")
+		return jsonify({"active_rings": storage.ring_count(time.time() - window)})
+	except ValueError as e:
+		return jsonify({"error": str(e)}), 400
 	except Exception as e:
 		return jsonify({"error": str(e)}), 500
 
 @app.route("/missyou/rings", methods=["GET"])
 def get_ring_timestamps():
-	data = load_missyou_data()
-	return jsonify(data.get("rings", []))
+	"""All ring timestamps, or only those in ?start=...&end=..."""
+	try:
+		return jsonify(storage.rings(_time_arg("start"), _time_arg("end")))
+	except ValueError as e:
+		return jsonify({"error": str(e)}), 400
 
 @app.route("/poem_override", methods=["POST"])
 def poem_override():
@@ -530,11 +476,9 @@ def add_reminder():
 	if not new_reminder:
 		return jsonify({"error": "No reminder provided"}), 400
 
-	reminders = load_reminders()
-	reminders.append(new_reminder)
-	save_reminders(reminders)
+	storage.add_reminder(new_reminder)
 
-	return jsonify({"status": "success", "reminders": reminders})
+	return jsonify({"status": "success", "reminders": load_reminders()})
 
 @app.route("/reminders", methods=["GET"])
 def get_reminders():
@@ -546,11 +490,9 @@ def edit_reminder():
 	index = data.get("index")
 	new_text = data.get("new_text")
 
-	reminders = load_reminders()
 	try:
-		reminders[index] = new_text
-		save_reminders(reminders)
-		return jsonify({"status": "success", "reminders": reminders})
+		storage.set_reminder(index, new_text)
+		return jsonify({"status": "success", "reminders": load_reminders()})
 	except IndexError:
 		return jsonify({"error": "Reminder not found"}), 404
 
@@ -559,11 +501,9 @@ def delete_reminder():
 	data = request.json
 	index = data.get("index")
 
-	reminders = load_reminders()
 	try:
-		removed = reminders.pop(index)
-		save_reminders(reminders)
-		return jsonify({"status": "deleted", "removed": removed, "reminders": reminders})
+		removed = storage.delete_reminder(index)
+		return jsonify({"status": "deleted", "removed": removed, "reminders": load_reminders()})
 	except IndexError:
 		return jsonify({"error": "Reminder not found"}), 404
 
@@ -593,6 +533,7 @@ def lights_set():
 	{"r":255,"g":0,"b":180,"w":0,"brightness":0.3}
 	or
 	{"hex":"#FF00B4","w":0,"brightness":0.3}
+	plus an optional "transition": seconds (crossfade from the current mode)
 	"""
 	try:
 		data = request.get_json(force=True) or {}
@@ -602,9 +543,9 @@ def lights_set():
 			return jsonify(body), code
 
 		# Local behavior (Pi)
-		if "brightness" in data and hasattr(L, "pixels"):
+		if "brightness" in data and hasattr(L, "set_brightness"):
 			try:
-				L.pixels.brightness = float(data.get("brightness"))
+				L.set_brightness(float(data.get("brightness")))
 			except Exception:
 				pass
 
@@ -616,7 +557,8 @@ def lights_set():
 			r = int(data.get("r", 0)); g = int(data.get("g", 0)); b = int(data.get("b", 0))
 			w = int(data.get("w", 0))
 
-		L.set_color(r, g, b, w)
+		kw = {"transition": float(data["transition"])} if data.get("transition") is not None else {}
+		L.set_color(r, g, b, w, **kw)
 		return jsonify({"status": "ok", "color": {"r": r, "g": g, "b": b, "w": w}})
 	except Exception as e:
 		return jsonify({"error": str(e)}), 400
@@ -632,6 +574,15 @@ def lights_mode():
 	{"mode":"wave","args":{"base":[0,120,255,0],"wavelength":18,"speed":0.02}}
 	{"mode":"rainbow","args":{"speed":0.02}}
 	{"mode":"fade","args":{"c1":[255,0,0,0],"c2":[0,0,255,0],"period":3.0}}
+	{"mode":"audio","args":{"source":"/tmp/mirror-audio.fifo","bands":16}} (WAV file, named pipe, or raw s16le PCM)
+	{"mode":"timeline","args":{"keyframes":[{"at":0,"color":[255,0,0,0]},{"at":1.5,"color":[0,0,255,0],"ease":"in_out"}],"loop":true}}
+	(timeline args may also carry "name", "overlay": true and "blend": "alpha|over|add|max")
+	Any mode can target a named segment instead of the whole strip:
+	{"mode":"rainbow","segment":"top","range":[60,190],"args":{"speed":0.02}}
+	{"mode":"clear","segment":"top"} (hand the pixels back to the whole-strip mode)
+	{"mode":"clear"} (fade out cues / overlays, e.g. a looping timeline overlay)
+	"transition": seconds crossfades from the current mode (default lights.TRANSITION, 0 = cut)
+	Raw frames (no JSON) go to /lights/frame and /lights/stream instead.
 	"""
 	try:
 		data = request.get_json(force=True) or {}
@@ -641,27 +592,42 @@ def lights_mode():
 
 		mode = (data.get("mode") or "").lower()
 		args = data.get("args") or {}
-
-		if mode == "pulse" and hasattr(L, "pulse"):
-			L.pulse(tuple(args.get("color", [0, 0, 255, 0])), float(args.get("seconds", 2.0)))
-		elif mode == "wave" and hasattr(L, "wave"):
-			L.wave(tuple(args.get("base", [0, 120, 255, 0])),
+		target = L
+		if data.get("segment") and hasattr(L, "segment"):
+			target = L.segment(str(data["segment"]), *(data.get("range") or ()))
+		# optional crossfade from the current mode, in seconds
+		kw = {"transition": float(data["transition"])} if data.get("transition") is not None else {}
+
+		if mode == "pulse" and hasattr(target, "pulse"):
+			target.pulse(tuple(args.get("color", [0, 0, 255, 0])), float(args.get("seconds", 2.0)), **kw)
+		elif mode == "wave" and hasattr(target, "wave"):
+			target.wave(tuple(args.get("base", [0, 120, 255, 0])),
 				int(args.get("wavelength", 18)),
-				float(args.get("speed", 0.02)))
-		elif mode == "rainbow" and hasattr(L, "rainbow"):
-			L.rainbow(float(args.get("speed", 0.02)), int(args.get("step", 2)))
-		elif mode == "fade" and hasattr(L, "fade_between"):
-			L.fade_between(tuple(args.get("c1", [255, 0, 0, 0])),
+				float(args.get("speed", 0.02)), **kw)
+		elif mode == "rainbow" and hasattr(target, "rainbow"):
+			target.rainbow(float(args.get("speed", 0.02)), int(args.get("step", 2)), **kw)
+		elif mode == "fade" and hasattr(target, "fade_between"):
+			target.fade_between(tuple(args.get("c1", [255, 0, 0, 0])),
 					tuple(args.get("c2", [0, 0, 255, 0])),
-					float(args.get("period", 3.0)))
-		elif mode == "bounce" and hasattr(L, "bounce"):
-			L.bounce(tuple(args.get("color", (255, 0, 0, 0))),
+					float(args.get("period", 3.0)), **kw)
+		elif mode == "bounce" and hasattr(target, "bounce"):
+			target.bounce(tuple(args.get("color", (255, 0, 0, 0))),
 				int(args.get("tail", 6)),
-				float(args.get("speed", 0.01)))
-		elif mode == "spotify" and hasattr(L, "spotify_mode"):
-			L.spotify_mode(float(args.get("tempo_bpm", 100.0)),
+				float(args.get("speed", 0.01)), **kw)
+		elif mode == "timeline" and hasattr(target, "timeline"):
+			target.timeline(args, overlay=bool(args.get("overlay", False)), blend=str(args.get("blend", "alpha")), **kw)
+		elif mode == "audio" and hasattr(target, "audio"):
+			from lights_audio import web_source # only the configured FIFO / audio folder, never any path
+			target.audio(web_source(args.get("source")), int(args.get("bands", 16)),
+				args.get("rate"), args.get("channels"), bool(args.get("loop", False)), **kw)
+		elif mode == "clear" and data.get("segment") and hasattr(L, "remove_segment"):
+			L.remove_segment(str(data["segment"]))
+		elif mode == "clear" and hasattr(target, "clear_cues"):
+			target.clear_cues() # fade out overlays (looping timeline cues never end on their own)
+		elif mode == "spotify" and hasattr(target, "spotify_mode"):
+			target.spotify_mode(float(args.get("tempo_bpm", 100.0)),
 				float(args.get("energy", 0.6)),
-				tuple(args.get("color", (0, 255, 180, 0))))
+				tuple(args.get("color", (0, 255, 180, 0))), **kw)
 		else:
 			return jsonify({"error": f"unknown mode or not supported: {mode}"}), 400
 
@@ -752,6 +718,100 @@ def lights_override():
 		return jsonify({"error": str(e)}), 500
 
 
+@app.route("/lights/stats", methods=["GET", "POST"])
+def lights_stats():
+	"""Per-mode frame counters, FPS, frame-time histogram, lock wait and show() time."""
+	try:
+		if RUN_LOCAL and hasattr(L, "stats"):
+			return jsonify(L.stats())
+		body, code = _forward_to_pi("/lights/stats")
+		return jsonify(body), code
+	except Exception as e:
+		return jsonify({"error": str(e)}), 500
+
+
+def _frame_target():
+	"""Whole strip, or ?segment=name[&start=..&stop=..] for client frames."""
+	name = request.args.get("segment")
+	if not name or not hasattr(L, "segment"):
+		return L
+	start, stop = request.args.get("start"), request.args.get("stop")
+	if start is not None and stop is not None:
+		return L.segment(name, int(start), int(stop))
+	return L.segment(name)
+
+
+def _read_exact(stream, n: int) -> bytes:
+	"""Up to n bytes from a request stream (short only at end of body)."""
+	chunks, got = [], 0
+	while got < n:
+		chunk = stream.read(n - got)
+		if not chunk:
+			break
+		chunks.append(chunk)
+		got += len(chunk)
+	return b"".join(chunks)
+
+
+@app.route("/lights/frame", methods=["POST"])
+def lights_frame():
+	"""
+	One client-rendered frame as application/octet-stream: num_pixels x 4 bytes,
+	R,G,B,W per pixel, held until the next frame or mode change.
+	"""
+	try:
+		if not RUN_LOCAL:
+			resp = requests.post(f"{STATIC_BASE}/lights/frame", params=request.args, data=request.get_data(),
+				headers={"Content-Type": "application/octet-stream"}, timeout=5)
+			return jsonify(resp.json()), resp.status_code
+		if not hasattr(L, "show_frame"):
+			return jsonify({"error": "frames not supported"}), 400
+		target = _frame_target()
+		target.show_frame(request.get_data(cache=False))
+		return jsonify({"status": "ok"})
+	except Exception as e:
+		return jsonify({"error": str(e)}), 400
+
+
+@app.route("/lights/stream", methods=["POST"])
+def lights_stream():
+	"""
+	Back-to-back frames in one (e.g. chunked) octet-stream body; each frame is
+	shown as soon as it is complete, so the sender sets the frame rate.
+	"""
+	try:
+		if not RUN_LOCAL:
+			return jsonify({"error": "stream to the Pi directly"}), 400
+		if not hasattr(L, "show_frame"):
+			return jsonify({"error": "frames not supported"}), 400
+		target = _frame_target()
+		size = target.num * 4
+		count = 0
+		while True:
+			data = _read_exact(request.stream, size)
+			if len(data) < size:
+				break # end of body (a trailing partial frame is dropped)
+			target.show_frame(data)
+			count += 1
+		return jsonify({"status": "ok", "frames": count})
+	except Exception as e:
+		return jsonify({"error": str(e)}), 400
+
+
+@app.route("/lights/preview", methods=["GET"])
+def lights_preview():
+	"""Current strip colors as [[r,g,b,w], ...] (before brightness/gamma)."""
+	try:
+		if RUN_LOCAL and hasattr(L, "frame"):
+			frame = L.frame()
+			return jsonify({"pixels": frame.tolist() if frame is not None else []})
+		return jsonify({"error": "no lights here"}), 404
+	except ConnectionError as e: # the lights daemon is down or restarting
+		return jsonify({"error": str(e)}), 503
+	except Exception as e:
+		return jsonify({"error": str(e)}), 500
+
+
 @app.route("/lights/heart", methods=["POST"])
 def lights_heart():
 	try:
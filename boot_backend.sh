@@ -6,15 +6,30 @@ VENV_PY="$APP_DIR/venv/bin/python3"
 NGROK_BIN="/usr/local/bin/ngrok"
 LOG_APP="$APP_DIR/app.log"
 LOG_NGROK="$APP_DIR/ngrok.log"
+LOG_LIGHTS="$APP_DIR/lights.log"
+LIGHTS_SOCKET="/tmp/smartmirror-lights.sock"
 
 cd "$APP_DIR"
 
 # 0) Clean up anything old (harmless if nothing running)
 pkill -f "python3 app.py" >/dev/null 2>&1 || true
+pkill -f "python3 lights_daemon.py" >/dev/null 2>&1 || true
 pkill -f "ngrok http 5000" >/dev/null 2>&1 || true
 
-# 1) Start Flask (use the VENV Python) and log to file
-nohup "$VENV_PY" app.py >>"$LOG_APP" 2>&1 &
+# the old daemon blanks the strip and removes its socket / frame block on exit: let it finish first
+for i in {1..50}; do
+    pgrep -f "python3 lights_daemon.py" >/dev/null || break
+    sleep 0.2
+done
+pkill -9 -f "python3 lights_daemon.py" >/dev/null 2>&1 || true
+
+# 1) Start the lights daemon (the only process that touches GPIO18), then Flask as its client
+nohup "$VENV_PY" lights_daemon.py --socket "$LIGHTS_SOCKET" >>"$LOG_LIGHTS" 2>&1 &
+for i in {1..10}; do
+    [ -S "$LIGHTS_SOCKET" ] && break
+    sleep 1
+done
+SMARTMIRROR_LIGHTS_SOCKET="$LIGHTS_SOCKET" nohup "$VENV_PY" app.py >>"$LOG_APP" 2>&1 &
 
 # 2) Wait up to 30s for Flask to answer on 127.0.0.1:5000
 for i in {1..30}; do
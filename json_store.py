@@ -0,0 +1,99 @@
+"""
+Parsed JSON files kept in memory. Every get() is one os.stat(): if the file's
+(mtime, size, inode) hasn't changed since we parsed it, the cached object is
+returned with no read or parse. save() writes atomically (tmp file +
+os.replace) and refreshes the cache, so our own writes never cost a re-parse.
+
+Files written by other processes (the mirror writes current_poem.json) are
+picked up on the next get() because their stat changes.
+"""
+import json
+import os
+import threading
+from typing import Any, Callable, Optional
+
+
+def _signature(st: os.stat_result) -> tuple:
+	return (st.st_mtime_ns, st.st_size, st.st_ino)
+
+
+class JsonStore:
+	"""
+	path -> (stat signature, parsed data). Cached objects are shared between
+	callers: treat what get() returns as read-only and copy before changing it.
+	"""
+
+	def __init__(self):
+		self._entries: "dict[str, tuple]" = {}
+		self._lock = threading.Lock()
+		self.hits = 0
+		self.misses = 0
+
+	def get(self, path: str, default: Any = None, check: Optional[Callable[[Any], bool]] = None) -> Any:
+		"""
+		Parsed contents of path, or default if it is missing, unreadable, not
+		valid JSON, or fails check(data). Errors aren't cached: a half-written
+		file is re-read on the next call.
+		"""
+		try:
+			sig = _signature(os.stat(path))
+		except OSError:
+			with self._lock:
+				self._entries.pop(path, None)
+			return default
+
+		with self._lock:
+			entry = self._entries.get(path)
+			if entry is not None and entry[0] == sig:
+				self.hits += 1
+				return entry[1]
+			self.misses += 1
+
+		try:
+			with open(path, "r", encoding="utf-8") as f:
+				data = json.load(f)
+		except (OSError, ValueError) as e:
+			print(f"json_store: can't read {path}: {e}")
+			return default
+		if check is not None and not check(data):
+			return default
+
+		with self._lock:
+			self._entries[path] = (sig, data)
+		return data
+
+	def save(self, path: str, data: Any, **dump_kw):
+		"""Atomically replace path with data (json.dump kwargs pass through) and cache it."""
+		parent = os.path.dirname(path)
+		if parent:
+			os.makedirs(parent, exist_ok=True)
+		# per process and thread, so concurrent writers never share a tmp file
+		tmp = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+		try:
+			with open(tmp, "w", encoding="utf-8") as f:
+				json.dump(data, f, **dump_kw)
+			os.replace(tmp, path)
+		except BaseException:
+			try:
+				os.unlink(tmp)
+			except OSError:
+				pass
+			raise
+		sig = _signature(os.stat(path))
+		with self._lock:
+			self._entries[path] = (sig, data)
+
+	def invalidate(self, path: Optional[str] = None):
+		with self._lock:
+			if path is None:
+				self._entries.clear()
+			else:
+				self._entries.pop(path, None)
+
+	def stats(self) -> dict:
+		with self._lock:
+			return {"files": len(self._entries), "hits": self.hits, "misses": self.misses}
+
+
+# shared by every route in the process
+store = JsonStore()
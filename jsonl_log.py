@@ -0,0 +1,155 @@
+"""
+Append-only history as JSON Lines (favorites.jsonl, removed.jsonl): one
+object per line, appended with a single write, so adding an entry is O(1)
+and a crash can at worst leave one torn last line, which readers skip.
+Readers stream the file line by line and never hold more than a page.
+
+An old favorites.json / removed.json array is moved into the log on first
+use and kept as .json.bak.
+"""
+import itertools
+import json
+import os
+import threading
+from typing import Iterator, Optional
+
+try:
+	import fcntl
+except ImportError: # appends are then only serialized within one process
+	fcntl = None
+
+
+class JsonlLog:
+	"""One history file; append / iterate / page / compact."""
+
+	def __init__(self, path: str, legacy: Optional[str] = None):
+		self.path = path
+		self.legacy = legacy # the old whole-array JSON file, imported once
+		self._lock = threading.Lock()
+
+	def _import_legacy(self):
+		if not self.legacy or not os.path.exists(self.legacy) or os.path.exists(self.path):
+			return
+		parent = os.path.dirname(self.path)
+		if parent:
+			os.makedirs(parent, exist_ok=True)
+		# across processes too: a second worker's rewrite would replace the log under the first one's appends
+		lock_fd = os.open(self.path + ".lock", os.O_RDWR | os.O_CREAT, 0o644)
+		try:
+			if fcntl is not None:
+				fcntl.flock(lock_fd, fcntl.LOCK_EX)
+			if os.path.exists(self.path) or not os.path.exists(self.legacy):
+				return # another worker imported it while we waited
+			try:
+				with open(self.legacy, "r", encoding="utf-8") as f:
+					arr = json.load(f)
+			except (OSError, ValueError) as e:
+				print(f"jsonl_log: can't import {self.legacy}: {e}")
+				return
+			self._rewrite(json.dumps(e, ensure_ascii=False) + "\n" for e in (arr if isinstance(arr, list) else []))
+			os.replace(self.legacy, self.legacy + ".bak")
+		finally:
+			os.close(lock_fd) # also drops the flock
+
+	def _rewrite(self, lines):
+		"""Atomically replace the log with lines (tmp file + os.replace)."""
+		parent = os.path.dirname(self.path)
+		if parent:
+			os.makedirs(parent, exist_ok=True)
+		tmp = f"{self.path}.{os.getpid()}.tmp"
+		with open(tmp, "w", encoding="utf-8") as f:
+			f.writelines(lines)
+			f.flush()
+			os.fsync(f.fileno())
+		os.replace(tmp, self.path)
+
+	def _open_locked(self, flags: int) -> int:
+		"""fd on the current log file with the flock held (retries if compact() swapped the file)."""
+		while True:
+			fd = os.open(self.path, flags, 0o644)
+			if fcntl is None:
+				return fd
+			fcntl.flock(fd, fcntl.LOCK_EX)
+			try:
+				if os.fstat(fd).st_ino == os.stat(self.path).st_ino:
+					return fd
+			except FileNotFoundError:
+				pass
+			os.close(fd)
+
+	def append(self, entry):
+		line = (json.dumps(entry, ensure_ascii=False) + "\n").encode("utf-8")
+		with self._lock:
+			self._import_legacy()
+			fd = self._open_locked(os.O_RDWR | os.O_APPEND | os.O_CREAT)
+			try:
+				size = os.fstat(fd).st_size
+				if size and os.pread(fd, 1, size - 1) != b"\n":
+					line = b"\n" + line # close a line torn by a crash so ours stays readable
+				os.write(fd, line)
+			finally:
+				os.close(fd) # also drops the flock
+
+	def __iter__(self) -> Iterator:
+		"""Entries oldest first, read lazily; unreadable lines are skipped."""
+		with self._lock:
+			self._import_legacy()
+		return self._lines()
+
+	def peek(self) -> Iterator:
+		"""Like iter(), but never writes: an old array not imported yet is read where it is."""
+		if self.legacy and os.path.exists(self.legacy) and not os.path.exists(self.path):
+			try:
+				with open(self.legacy, "r", encoding="utf-8") as f:
+					arr = json.load(f)
+			except (OSError, ValueError) as e:
+				print(f"jsonl_log: can't read {self.legacy}: {e}")
+				return iter(())
+			return iter(arr if isinstance(arr, list) else [])
+		return self._lines()
+
+	def _lines(self) -> Iterator:
+		try:
+			f = open(self.path, "r", encoding="utf-8")
+		except FileNotFoundError:
+			return
+		with f:
+			for line in f:
+				if not line.strip():
+					continue
+				try:
+					yield json.loads(line)
+				except ValueError:
+					continue
+
+	def page(self, offset: int = 0, limit: int = 50) -> list:
+		"""Entries [offset, offset + limit) in file order, holding only that many in memory."""
+		return list(itertools.islice(iter(self), max(0, offset), max(0, offset) + max(0, limit)))
+
+	def compact(self) -> dict:
+		"""Rewrite the log without torn / unreadable lines, streaming. Returns {"kept", "dropped"}."""
+		with self._lock:
+			self._import_legacy()
+			if not os.path.exists(self.path):
+				return {"kept": 0, "dropped": 0}
+			fd = self._open_locked(os.O_RDWR) # appenders wait, then follow the new file
+			try:
+				counts = {"kept": 0, "dropped": 0}
+
+				def _good_lines(f):
+					for line in f:
+						if not line.strip():
+							continue
+						try:
+							json.loads(line)
+						except ValueError:
+							counts["dropped"] += 1
+							continue
+						counts["kept"] += 1
+						yield line if line.endswith("\n") else line + "\n"
+
+				with open(self.path, "r", encoding="utf-8") as f:
+					self._rewrite(_good_lines(f))
+				return counts
+			finally:
+				os.close(fd)
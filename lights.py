@@ -1,8 +1,10 @@
-import time
-import math
-import threading
+import os
 from typing import Tuple, Optional
 
+import lights_frames as frames
+import lights_timeline as timelines
+from lights_engine import Cycle, Layer, Live, RenderLoop, SolidCycle, Static
+
 ON_PI = False
 board = None
 neopixel = None
@@ -20,6 +22,17 @@ except Exception:
 # ---------- BASIC SETTINGS ----------
 NUM_PIXELS = 250 # set to your strip length
 BRIGHTNESS = 0.25 # 0.0 .. 1.0
+GAMMA = 2.2 # perceptual correction applied with brightness (1.0 = off)
+WHITE_BALANCE = (1.0, 1.0, 1.0, 1.0) # per-channel R,G,B,W gain
+TARGET_FPS = 60 # render loop tick rate
+TRANSITION = 0.5 # default crossfade between modes in seconds (0 = hard cut)
+# named pixel ranges [start, stop) that can run their own mode, e.g.
+# {"left": (0, 60), "top": (60, 190)}; more can be added at runtime with Lights.segment()
+SEGMENTS = {}
+# off the Pi, set SMARTMIRROR_VIRTUAL_LIGHTS=1 to run the real Lights on a simulated strip
+VIRTUAL_LIGHTS = os.environ.get("SMARTMIRROR_VIRTUAL_LIGHTS", "").lower() in ("1", "true", "yes")
+# set to lights_daemon's socket path to drive the strip through the daemon instead of owning it
+LIGHTS_SOCKET = os.environ.get("SMARTMIRROR_LIGHTS_SOCKET", "")
 
 if ON_PI:
 	PIN = board.D18 # GPIO18 / physical pin 12
@@ -30,6 +43,10 @@ else:
 
 Color = Tuple[int, int, int, int] # (R,G,B,W) for RGBW; use 0 for W on RGB strips
 
+# built-in effects that are pure keyframe data
+HEART = timelines.normalize(timelines.heart())
+STORM = timelines.normalize(timelines.storm())
+
 
 # ---------- fallback base class ----------
 if not ON_PI:
@@ -46,6 +63,14 @@ if not ON_PI:
 		def override_burn(self, *a, **k): self._mode_name = "override"
 		def weather(self, *a, **k): self._mode_name = "weather"
 		def spotify_mode(self, *a, **k): self._mode_name = "spotify"
+		def timeline(self, *a, **k): self._mode_name = "timeline"
+		def audio(self, *a, **k): self._mode_name = "audio"
+		def clear_cues(self, *a, **k): pass
+		def segment(self, *a, **k): return self
+		def show_frame(self, *a, **k): self._mode_name = "frame"
+		def pause(self, *a, **k): pass
+		def resume(self, *a, **k): pass
+		def close(self, *a, **k): pass
 	LightsBase = DummyLights
 else:
 	LightsBase = object # or real LED class if ON_PI
@@ -81,327 +106,388 @@ def wheel(pos: int) -> Color:
 
 
 class Lights(LightsBase or object):
-	def __init__(self, num_pixels: int = NUM_PIXELS, pin=PIN, brightness: float = BRIGHTNESS):
+	_audio_feed = None # lights_audio.AudioFeed while the audio mode runs
+	_cue_prefix = "" # overlay keys this object owns (a Zone's are "name:...")
+	def __init__(self, num_pixels: int = NUM_PIXELS, pin=PIN, brightness: float = BRIGHTNESS, fps: float = TARGET_FPS,
+			pixels=None, autostart: bool = True):
 		self.num = num_pixels
-		self.pixels = neopixel.NeoPixel(
-			pin,
-			num_pixels,
-			brightness=brightness,
-			auto_write=False,
-			pixel_order=ORDER,
-		)
-		self._lock = threading.Lock()
-		self._stop = threading.Event()
-		self._thread: Optional[threading.Thread] = None
+		pixel_order = getattr(pixels, "pixel_order", None) # byte order on the wire
+		if pixels is None:
+			pixel_order = ORDER
+			pixels = neopixel.NeoPixel(
+				pin,
+				num_pixels,
+				brightness=1.0, # applied by the engine's color LUT instead
+				auto_write=False,
+				pixel_order=ORDER,
+			)
+		self.pixels = pixels # real strip, or e.g. lights_sim.VirtualStrip
 		self._mode_name = "off"
+		self._mode_args = {}
+		self._brightness = brightness
 		self._last_solid: Tuple[int, int, int, int] = (0, 0, 0, 0)
-		self._long_modes = {"pulse", "bounce", "wave", "fade_between", "weather", "rainbow", "spotify_mode"}
+		self._span: Optional[Tuple[int, int]] = None # whole strip
+		self._zones = {}
+		self._zone_ranges = dict(SEGMENTS)
+		self.transition = TRANSITION
+		# from here on only the engine's output thread touches self.pixels
+		self.engine = RenderLoop(self.pixels, num_pixels, fps=fps,
+			brightness=brightness, gamma=GAMMA, white_balance=WHITE_BALANCE,
+			pixel_order=pixel_order)
+		if autostart: # False lets a caller (e.g. lights_bench) drive render_once() itself
+			self.engine.start()
 
 	def _remember_mode(self, name: str, **kwargs):
 		self._mode_name = name
 		self._mode_args = dict(kwargs or {})
 
-	# ---------- threading helpers ----------
-	def _start_thread(self, target, *args, **kwargs):
-		self.stop() # stop any existing animation
-		self._stop.clear()
-		self._thread = threading.Thread(target=target, args=args, kwargs=kwargs, daemon=True)
-		self._thread.start()
+	# ---------- render loop helpers ----------
+	def _play(self, name: str, build, transition: Optional[float] = None):
+		"""
+		Hand a mode to the render loop and return immediately. build() makes the
+		Animation on the render thread, and only if no newer mode replaces it first.
+		The old mode crossfades into it over `transition` seconds (default self.transition).
+		"""
+		def _make():
+			anim = build()
+			anim.name = name
+			return anim
+		self._stop_audio()
+		self.engine.set_animation(_make, self.transition if transition is None else transition)
 
 	def stop(self):
-		self._stop.set()
-		t = self._thread
-		if t and t.is_alive():
-			if threading.current_thread() is not t: # only join if it's not the same thread
-				t.join(timeout=1.0)
-		self._thread = None
+		self._stop_audio()
+		self.clear_cues()
+		self.engine.set_animation(None)
 		self._mode_name = "off"
 
-	def off(self):
-		with self._lock:
-			self.pixels.fill((0, 0, 0, 0))
-			self.pixels.show()
-			# leave brightness unchanged, just go dark
-			self._mode_name = "off"
-
-	def set_color(self, r: int, g: int, b: int, w: int = 0):
-		self.stop()
-		with self._lock:
-			c = (clamp255(r), clamp255(g), clamp255(b), clamp255(w))
-			self.pixels.fill(c)
-			self.pixels.show()
-			self._last_solid = c
-			self._mode_name = "solid"
-
-	def _snapshot(self):
-		"""Capture enough info to restore previous state after an event animation."""
-		return {
-			"mode": self._mode_name, # "off" | "solid" | "pulse" | ...
-			"args": dict(self._mode_args or {}),
-			"solid": getattr(self, "_last_solid", (0, 0, 0, 0)),
-			"brightness": getattr(self.pixels, "brightness", None),
-		}
-
-	def _restore(self, snap):
-		"""Return to the previous state recorded by _snapshot()."""
-		if not isinstance(snap, dict):
-			return
-
-		# restore brightness first (best effort)
-		if snap.get("brightness") is not None:
-			try:
-				self.pixels.brightness = snap["brightness"]
-			except Exception:
-				pass
-
-		mode = snap.get("mode", "off")
-		args = snap.get("args") or {}
-
-		if mode in self._long_modes:
-			getattr(self, mode)(**args)
-
-		elif mode == "off":
-			with self._lock:
-				self.pixels.fill((0, 0, 0, 0))
-				self.pixels.show()
-			self._mode_name = "off"
-			return
+	def close(self):
+		"""Stop the render and output threads; whatever was asked for last (e.g. off(transition=0)) is shown first."""
+		self.engine.shutdown()
 
-		elif mode == "solid":
-			r, g, b, w = snap.get("solid", (0, 0, 0, 0))
-			# set_color() calls stop(), which is safe now due to the self-join guard
-			self.set_color(r, g, b, w)
-			return
+	def off(self, transition: Optional[float] = None):
+		# leave brightness unchanged, just go dark (cues too: a looping overlay would otherwise stay up)
+		self.clear_cues()
+		self._play("off", lambda: Static(frames.empty(self.num)), transition)
+		self._mode_name = "off"
 
+	def set_color(self, r: int, g: int, b: int, w: int = 0, transition: Optional[float] = None):
+		c = (clamp255(r), clamp255(g), clamp255(b), clamp255(w))
+		self._play("solid", lambda: Static(frames.solid(self.num, c)), transition)
+		self._last_solid = c
+		self._mode_name = "solid"
+
+	def show_frame(self, data):
+		"""Show one client-rendered frame: num_pixels x 4 raw RGBW bytes, held until the next one."""
+		frame = frames.from_bytes(data, self.num) # raises ValueError on a bad length
+		self._play("frame", lambda: Static(frame), transition=0.0) # the sender does its own fading
+		self._mode_name = "frame"
+
+	def set_brightness(self, value: float):
+		# the color LUT is rebuilt once on the next tick; the same frame is re-sent at the new level
+		self._brightness = max(0.0, min(1.0, float(value)))
+		self.engine.set_levels(brightness=self._brightness)
+
+	def frame(self):
+		"""Frame the strip is showing, before color correction (for previews)."""
+		return self.engine.output.last_frame()
+
+	def stats(self) -> dict:
+		"""Render loop, output and per-mode telemetry (served at /lights/stats)."""
+		out = self.engine.stats()
+		out["frame_cache"] = frames.cache.stats()
+		out["brightness"] = self._brightness
+		return out
+
+	# ---------- segments ----------
+	def segment(self, name: str, start: Optional[int] = None, stop: Optional[int] = None) -> "Zone":
+		"""
+		Named pixel range that takes the same mode calls as the whole strip, e.g.
+		L.segment("left", 0, 60).weather("rain"). Every segment is drawn into the
+		one frame the render loop pushes per tick. Without start/stop the range
+		comes from SEGMENTS or an earlier call.
+		"""
+		if start is not None and stop is not None:
+			span = (int(start), int(stop))
+		elif name in self._zone_ranges:
+			span = tuple(self._zone_ranges[name])
 		else:
-			self.off()
-
-	# ---------- animations (run in threads) ----------
-	def pulse(self, color: Color, seconds: float = 2.0):
+			raise ValueError(f"unknown segment {name!r}; give start and stop")
+		if not 0 <= span[0] < span[1] <= self.num:
+			raise ValueError(f"segment {name!r} range {span[0]}..{span[1]} is outside 0..{self.num}")
+
+		zone = self._zones.get(name)
+		if zone is None or zone._span != span:
+			if zone is not None:
+				zone.stop() # moved: clear the old range
+			zone = Zone(self, name, *span)
+			self._zones[name] = zone
+			self._zone_ranges[name] = span
+		return zone
+
+	def remove_segment(self, name: str):
+		"""Hand the segment's pixels back to the whole-strip mode."""
+		zone = self._zones.pop(name, None)
+		if zone is not None:
+			zone.stop()
+
+	def pause(self):
+		"""Hold the current frame; resume() carries on from the same phase."""
+		self.engine.pause()
+
+	def resume(self):
+		self.engine.resume()
+
+	# ---------- animations (built and rendered by the render loop) ----------
+	def _table(self, key: tuple, build, steps: int):
+		"""Cycle table for this strip length from the shared frame cache, or None if it would be too big."""
+		if steps * self.num * frames.CHANNELS > frames.cache.max_bytes:
+			return None # don't even build it
+		return frames.cache.get(key + (self.num,), build)
+
+	def pulse(self, color: Color, seconds: float = 2.0, transition: Optional[float] = None):
 		"""Breathing pulse up/down."""
 		self._mode_name = "pulse"
 		self._remember_mode("pulse", color=color, seconds=seconds)
-		def _run():
-			while not self._stop.is_set():
-				# up
-				for t in [i / 60.0 for i in range(61)]:
-					if self._stop.is_set(): break
-					c = tuple(int(v * t) for v in color)
-					with self._lock:
-						self.pixels.fill(c)
-						self.pixels.show()
-					time.sleep(seconds / 120.0)
-				# down
-				for t in [i / 60.0 for i in range(60, -1, -1)]:
-					if self._stop.is_set(): break
-					c = tuple(int(v * t) for v in color)
-					with self._lock:
-						self.pixels.fill(c)
-						self.pixels.show()
-					time.sleep(seconds / 120.0)
-		self._start_thread(_run)
-
-	def bounce(self, color: Color = (255, 0, 0, 0), tail: int = 10, speed: float = 0.01):
+		self._play("pulse", lambda: SolidCycle(
+			frames.cache.get(("pulse", tuple(color)), lambda: frames.pulse_colors(color)),
+			self.num, seconds / 120.0), transition)
+
+	def bounce(self, color: Color = (255, 0, 0, 0), tail: int = 10, speed: float = 0.01,
+			transition: Optional[float] = None):
 		"""Ping-pong dot with optional fading tail."""
 		self._mode_name = "bounce"
 		self._remember_mode("bounce", color=color, tail=tail, speed=speed)
-		def _run():
-			idx = 0
-			direction = 1
-			while not self._stop.is_set():
-				with self._lock:
-					self.pixels.fill((0, 0, 0, 0))
-					for t in range(tail):
-						j = idx - t * direction
-						if 0 <= j < self.num:
-							fade = max(0, 1 - (t / tail))
-							c = tuple(int(v * fade) for v in color)
-							self.pixels[j] = c
-					self.pixels.show()
-				idx += direction
-				if idx >= self.num - 1: direction = -1
-				if idx <= 0: direction = 1
-				time.sleep(speed)
-		self._start_thread(_run)
-
-	def wave(self, base: Color = (0, 0, 255, 0), wavelength: int = 16, speed: float = 0.1):
+		span = max(1, self.num - 1)
+
+		def _frame(step: int):
+			# idx runs 0 .. num-1 .. 0; the tail trails behind the direction of travel
+			p = step % (2 * span)
+			idx, direction = (p, 1) if p < span else (2 * span - p, -1)
+			return frames.bounce_frame(self.num, color, tail, idx, direction)
+
+		self._play("bounce", lambda: Live(_frame, speed), transition)
+
+	def wave(self, base: Color = (0, 0, 255, 0), wavelength: int = 16, speed: float = 0.1,
+			transition: Optional[float] = None):
 		"""Sine intensity wave across the strip."""
 		self._mode_name = "wave"
 		self._remember_mode("wave", base=base, wavelength=wavelength, speed=speed)
-		def _run():
-			phase = 0.0
-			while not self._stop.is_set():
-				with self._lock:
-					for i in range(self.num):
-						s = (math.sin((i + phase) * 2 * math.pi / wavelength) + 1) / 2
-						self.pixels[i] = tuple(int(v * s) for v in base)
-					self.pixels.show()
-				phase += 1
-				time.sleep(speed)
-		self._start_thread(_run)
-
-	def rainbow(self, speed: float = 0.01, step: int = 2):
+
+		def _build():
+			# a fractional wavelength never repeats exactly -> render every frame
+			if wavelength == int(wavelength):
+				table = self._table(("wave", tuple(base), int(wavelength)),
+					lambda: frames.wave_cycle(self.num, base, int(wavelength)), int(wavelength))
+				if table is not None:
+					return Cycle(table, speed)
+			return Live(lambda step: frames.wave_frame(self.num, base, wavelength, step), speed)
+
+		self._play("wave", _build, transition)
+
+	def rainbow(self, speed: float = 0.01, step: int = 2, transition: Optional[float] = None):
 		"""Classic moving rainbow."""
 		self._mode_name = "rainbow"
 		self._remember_mode("rainbow", speed=speed, step=step)
-		def _run():
-			pos = 0
-			while not self._stop.is_set():
-				with self._lock:
-					for i in range(self.num):
-						self.pixels[i] = wheel((i * 256 // self.num + pos) & 255)
-					self.pixels.show()
-				pos = (pos + step) & 255
-				time.sleep(speed)
-		self._start_thread(_run)
-
-	def fade_between(self, c1: Color, c2: Color, period: float = 5.0):
+
+		def _build():
+			table = self._table(("rainbow", int(step) & 255), lambda: frames.rainbow_cycle(self.num, step),
+				frames.rainbow_steps(step))
+			if table is None: # strip too long for a table
+				return Live(lambda s: frames.rainbow_frame(self.num, (s * int(step)) & 255), speed)
+			return Cycle(table, speed)
+
+		self._play("rainbow", _build, transition)
+
+	def fade_between(self, c1: Color, c2: Color, period: float = 5.0, transition: Optional[float] = None):
 		"""Smoothly fade back and forth between two colors."""
 		self._mode_name = "fade_between"
 		self._remember_mode("fade_between", c1=c1, c2=c2, period=period)
-		def _run():
-			t = 0.0
-			direction = 1
-			step = 1 / 60.0 # 60 steps per half cycle
-			while not self._stop.is_set():
-				b = blend(c1, c2, t)
-				with self._lock:
-					self.pixels.fill(b)
-					self.pixels.show()
-				t += direction * step / (period / 2.0)
-				if t >= 1.0:
-					t = 1.0
-					direction = -1
-				elif t <= 0.0:
-					t = 0.0
-					direction = 1
-				time.sleep(1/60.0)
-		self._start_thread(_run)
-
-	# ---------- event cues ----------
+
+		def _frame(step: int):
+			# triangle wave 0 -> 1 -> 0, 60 steps per second
+			p = (step / 60.0) / (period / 2.0) % 2.0
+			return frames.solid(self.num, blend(c1, c2, p if p <= 1.0 else 2.0 - p))
+
+		def _build():
+			colors = frames.cache.get(("fade_between", tuple(c1), tuple(c2), float(period)),
+				lambda: frames.fade_colors(c1, c2, period))
+			if colors is None: # period too long for a table
+				return Live(_frame, 1 / 60.0)
+			return SolidCycle(colors, self.num, 1 / 60.0)
+
+		self._play("fade_between", _build, transition)
+
+	# ---------- audio reactive (see lights_audio) ----------
+	def audio(self, source: str = "-", bands: int = 16, rate: Optional[int] = None, channels: Optional[int] = None,
+			loop: bool = False, transition: Optional[float] = None):
+		"""
+		Spectrum across the strip from live PCM: a WAV file, a named pipe or
+		"-" for stdin (raw input is s16le; give rate/channels if not 44.1 kHz stereo).
+		"""
+		from lights_audio import AudioFeed
+		self._remember_mode("audio", source=source, bands=bands, rate=rate, channels=channels, loop=loop)
+		bands = max(1, min(int(bands), self.num))
+		band_of, colors = frames.band_layout(self.num, bands)
+		feed = AudioFeed(source, bands, fps=self.engine.fps, rate=rate, channels=channels, loop=loop)
+		self._play("audio", lambda: Live(lambda step: frames.spectrum_frame(colors, band_of, feed.levels),
+			1.0 / self.engine.fps), transition)
+		self._audio_feed = feed.start()
+
+	def _stop_audio(self):
+		feed, self._audio_feed = self._audio_feed, None
+		if feed is not None:
+			feed.stop()
+
+	# ---------- keyframe timelines (see lights_timeline) ----------
+	def _timeline_anim(self, spec: dict) -> SolidCycle:
+		"""Compile a normalized timeline once (cached, one color per step) and play it."""
+		colors = frames.cache.get(("timeline", timelines.cache_key(spec)), lambda: timelines.compile_timeline(spec))
+		return SolidCycle(colors, self.num, 1.0 / spec["fps"], loop=spec["loop"])
+
+	def timeline(self, spec: dict, overlay: bool = False, blend: str = "alpha", transition: Optional[float] = None):
+		"""Play a keyframe timeline as the base mode, or as a cue over it (overlay=True)."""
+		name = str(spec.get("name") or "timeline")
+		spec = timelines.normalize(spec) # raises ValueError in the caller's thread
+		if overlay:
+			self._cue(name, lambda: self._timeline_anim(spec), blend=blend)
+			return
+		self._remember_mode("timeline", spec=spec)
+		# one fixed name: it keys the per-mode stats, and client-chosen names would grow them without bound
+		self._play("timeline", lambda: self._timeline_anim(spec), transition)
+
+	# ---------- event cues (overlays; the base mode keeps running underneath) ----------
+	def _cue(self, key: str, build, blend: str = "alpha", fade_in: float = 0.0, fade_out: float = 0.0,
+			hold: bool = False):
+		"""hold=True pauses the base mode while the cue is up; it then carries on mid-cycle."""
+		anim = build()
+		anim.name = key
+		self.engine.add_overlay(key, Layer(anim, blend=blend, fade_in=fade_in, fade_out=fade_out,
+			span=self._span, hold_base=hold and self._span is None))
+
+	def clear_cues(self):
+		"""Fade out every cue on this strip (or zone), looping timeline overlays included."""
+		self.engine.release_overlays(self._cue_prefix)
+
 	def heart_pulse(self):
-		"""Double-beat red flash (dun-dun), then restore previous state."""
-		prev = self._snapshot()
-		print("snap before: ", prev)
-		self._mode_name = "heart"
-
-		def _run():
-			try:
-				# two quick beats with a tiny pause
-				for beat in (1, 2):
-					# quick ramp up and down (total ~0.25s per beat)
-					for t in [0.0, 0.4, 1.0, 0.4, 0.0]:
-						c = (int(255 * t), 0, 0, 0) # GRBW: red only
-						with self._lock:
-							self.pixels.fill(c)
-							self.pixels.show()
-						time.sleep(0.05) # 5 steps × 0.05s = 0.25s
-					if beat == 1:
-						time.sleep(0.12) # gap between beats
-			finally:
-				# always restore whatever was happening before
-				self._restore(prev)
-
-		self._start_thread(_run)
+		"""Double-beat red flash (dun-dun) over whatever is running."""
+		# "over": the red covers the base as it brightens and uncovers it as it dims
+		self._cue("heart", lambda: self._timeline_anim(HEART), blend="over", hold=True)
 
 	def override_burn(self, seconds: float = 10.0):
-		"""Smoothly fade Red → Purple → Blue over ~seconds, then restore."""
-		prev = self._snapshot()
-		self._mode_name = "override"
-
-		# keyframes in GRBW (W=0). Red -> Purple -> Blue
-		seq = [(255, 0, 0, 0), (128, 0, 180, 0), (0, 0, 255, 0)]
-
-		def _run():
-			try:
-				total_steps = 60 * max(1, int(seconds)) # ~60 FPS
-				# three segments: 0->1, 1->2
-				segments = [(seq[0], seq[1]), (seq[1], seq[2])]
-				steps_per_seg = max(1, total_steps // len(segments))
-
-				for c1, c2 in segments:
-					for s in range(steps_per_seg + 1):
-						t = s / steps_per_seg
-						c = (
-							int(c1[0] + (c2[0] - c1[0]) * t),
-							int(c1[1] + (c2[1] - c1[1]) * t),
-							int(c1[2] + (c2[2] - c1[2]) * t),
-							0,
-						)
-						with self._lock:
-							self.pixels.fill(c)
-							self.pixels.show()
-						time.sleep(1.0 / 60.0)
-			finally:
-				self._restore(prev)
-
-		self._start_thread(_run)
+		"""Smoothly fade Red → Purple → Blue over ~seconds, then fade back to the base mode."""
+		spec = timelines.normalize(timelines.override_burn(seconds))
+		self._cue("override", lambda: self._timeline_anim(spec), fade_in=0.25, fade_out=0.5, hold=True)
 
 	# ---------- weather wrapper ----------
-	def weather(self, condition: str):
+	def weather(self, condition: str, transition: Optional[float] = None):
 		"""Map simple condition keywords to effects."""
 		self._remember_mode("weather", condition=condition)
 		cond = (condition or "").lower()
 		if "sun" in cond or "clear" in cond:
-			self.set_color(255, 170, 0, 0) # warm
+			self.set_color(255, 170, 0, 0, transition=transition) # warm
 		elif "cloud" in cond or "overcast" in cond:
-			self.pulse((120, 120, 120, 30), seconds=3.5)
+			self.pulse((120, 120, 120, 30), seconds=3.5, transition=transition)
 		elif "rain" in cond or "drizzle" in cond:
-			self.wave((0, 80, 200, 0), wavelength=18, speed=0.02)
+			self.wave((0, 80, 200, 0), wavelength=18, speed=0.02, transition=transition)
 		elif "snow" in cond:
-			self.fade_between((180, 220, 255, 40), (80, 120, 200, 10), period=4.0)
+			self.fade_between((180, 220, 255, 40), (80, 120, 200, 10), period=4.0, transition=transition)
 		elif "storm" in cond or "thunder" in cond:
 			self._mode_name = "storm"
-			def _run():
-				pos = 0
-				while not self._stop.is_set():
-					# blue base
-					with self._lock:
-						self.pixels.fill((0, 40, 150, 0))
-						# occasional white flash
-						if pos % 50 == 0:
-							for _ in range(2):
-								self.pixels.fill((255, 255, 255, 60))
-								self.pixels.show()
-								time.sleep(0.04)
-								self.pixels.fill((0, 40, 150, 0))
-								self.pixels.show()
-								time.sleep(0.06)
-						self.pixels.show()
-					pos += 1
-					time.sleep(0.03)
-			self._start_thread(_run)
+			# blue base with an occasional double white flash
+			self._play("storm", lambda: self._timeline_anim(STORM), transition)
 		else:
-			self.set_color(120, 120, 120, 10) # default soft white
+			self.set_color(120, 120, 120, 10, transition=transition) # default soft white
 
 	# ---------- Spotify hook (stub) ----------
-	def spotify_mode(self, tempo_bpm: float = 100.0, energy: float = 0.5, color: Color = (0, 255, 180, 0)):
+	def spotify_mode(self, tempo_bpm: float = 100.0, energy: float = 0.5, color: Color = (0, 255, 180, 0),
+			transition: Optional[float] = None):
 		"""
 		Stub: animate to a tempo & energy. Later the app can call this with Spotify API data.
 		"""
 		self._mode_name = "spotify"
 		beat_sec = max(0.2, 60.0 / max(1.0, tempo_bpm))
 		amplitude = max(0.1, min(1.0, energy))
+		# beat flash for the first 20% of each beat
+		spec = timelines.normalize(timelines.beat_flash(color, amplitude, beat_sec))
+		self._play("spotify", lambda: self._timeline_anim(spec), transition)
+
+class Zone(Lights):
+	"""
+	One named segment of a Lights strip. Mode methods behave as on the whole
+	strip but render only stop - start pixels, and cues stay inside the range.
+	Brightness, color correction and pause()/resume() are shared with the strip.
+	"""
+
+	def __init__(self, strip: Lights, name: str, start: int, stop: int):
+		self.strip = strip
+		self.name = name
+		self.num = stop - start
+		self.engine = strip.engine
+		self._span = (start, stop)
+		self._mode_name = "off"
+		self._mode_args = {}
+		self._last_solid: Tuple[int, int, int, int] = (0, 0, 0, 0)
+		self.transition = strip.transition
+		self._cue_prefix = f"{name}:"
+
+	@property
+	def _brightness(self) -> float:
+		return self.strip._brightness
+
+	def _play(self, name: str, build, transition: Optional[float] = None):
+		def _make():
+			anim = build()
+			anim.name = name
+			return anim
+		self._stop_audio()
+		self.engine.set_segment(self.name, self._span[0], self._span[1], _make,
+			self.transition if transition is None else transition)
+
+	def close(self):
+		"""Zones share the strip's threads: closing one only clears its segment."""
+		self.stop()
+
+	def stop(self):
+		self._stop_audio()
+		self.clear_cues()
+		self.engine.set_segment(self.name, self._span[0], self._span[1], None)
+		self._mode_name = "off"
+
+	def _cue(self, key: str, build, **kwargs):
+		super()._cue(self._cue_prefix + key, build, **kwargs)
+
+	def set_brightness(self, value: float):
+		self.strip.set_brightness(value)
+
+	def stats(self) -> dict:
+		return self.strip.stats()
+
+	def segment(self, *a, **k):
+		raise ValueError("segments can't be nested; call segment() on the strip")
 
-		def _run():
-			while not self._stop.is_set():
-				# beat flash
-				with self._lock:
-					self.pixels.fill(tuple(int(v * amplitude) for v in color))
-					self.pixels.show()
-				time.sleep(beat_sec * 0.2)
-				with self._lock:
-					self.pixels.fill((0, 0, 0, 0))
-					self.pixels.show()
-				time.sleep(beat_sec * 0.8)
-		self._start_thread(_run)
 
 # Convenience singleton (optional)
 _lights_instance: Optional[Lights] = None
 
 
+def create_lights() -> Lights:
+	"""A Lights that owns the strip in this process (what lights_daemon runs)."""
+	if ON_PI:
+		return Lights()
+	if VIRTUAL_LIGHTS:
+		from lights_sim import VirtualStrip
+		return Lights(pixels=VirtualStrip(NUM_PIXELS))
+	return DummyLights()
+
+
 def get_lights() -> Lights:
 	global _lights_instance
 	if _lights_instance is None:
-		_lights_instance = (Lights() if ON_PI else DummyLights())
+		if LIGHTS_SOCKET:
+			# the daemon owns GPIO18; every web worker is just a client
+			from lights_daemon import LightsClient
+			_lights_instance = LightsClient(LIGHTS_SOCKET)
+		else:
+			_lights_instance = create_lights()
 	return _lights_instance
@@ -0,0 +1,301 @@
+"""
+Audio-reactive input for Lights.audio(): streams PCM from a WAV file, a named
+pipe or stdin, runs a windowed FFT every hop and keeps the latest band levels
+for the render loop. Nothing is loaded whole; memory is one FFT window.
+Web requests may only name SMARTMIRROR_AUDIO_FIFO or a file under
+SMARTMIRROR_AUDIO_DIR (see web_source).
+
+Offline check against a WAV fixture (analysis speed vs real time):
+	python lights_audio.py song.wav --fps 60 --bands 16
+"""
+import argparse
+import io
+import os
+import select
+import stat
+import sys
+import threading
+import time
+import wave
+from typing import Iterator, Optional
+
+import numpy as np
+
+# what /lights/mode may play: the configured FIFO, or a file under the audio folder
+AUDIO_FIFO = os.environ.get("SMARTMIRROR_AUDIO_FIFO", "/tmp/smartmirror-audio.fifo")
+AUDIO_DIR = os.environ.get("SMARTMIRROR_AUDIO_DIR", "audio")
+
+DEFAULT_RATE = 44100 # raw PCM (no WAV header) is assumed to be s16le at this rate
+DEFAULT_CHANNELS = 2
+POLL = 0.1 # seconds a pipe read waits before checking whether the feed was stopped
+
+
+# ---------- sources ----------
+def _decode(data: bytes, width: int, channels: int) -> np.ndarray:
+	"""Interleaved PCM bytes -> mono float32 in -1..1."""
+	if width == 1:
+		x = np.frombuffer(data, dtype=np.uint8).astype(np.float32) - 128.0
+		scale = 128.0
+	elif width == 2:
+		x = np.frombuffer(data, dtype="<i2").astype(np.float32)
+		scale = 32768.0
+	elif width == 3:
+		b = np.frombuffer(data, dtype=np.uint8).reshape(-1, 3).astype(np.int32)
+		x = ((b[:, 0] | (b[:, 1] << 8) | (b[:, 2] << 16)) << 8 >> 8).astype(np.float32)
+		scale = 8388608.0
+	elif width == 4:
+		x = np.frombuffer(data, dtype="<i4").astype(np.float32)
+		scale = 2147483648.0
+	else:
+		raise ValueError(f"unsupported sample width: {width} bytes")
+	n = len(x) // channels * channels
+	return x[:n].reshape(-1, channels).mean(axis=1) / scale
+
+
+def web_source(source: Optional[str] = None) -> str:
+	"""
+	Source named by a web request -> a path PCMSource may open: AUDIO_FIFO
+	(the default) or a regular file under AUDIO_DIR (relative names are taken
+	from there). Anything else raises ValueError.
+	"""
+	if not source:
+		source = AUDIO_FIFO
+	path = os.path.realpath(os.path.join(AUDIO_DIR, source))
+	try:
+		mode = os.stat(path).st_mode
+	except OSError:
+		raise ValueError(f"no such audio source: {source!r}") from None
+	if stat.S_ISFIFO(mode) and path == os.path.realpath(AUDIO_FIFO):
+		return path
+	root = os.path.realpath(AUDIO_DIR)
+	if stat.S_ISREG(mode) and os.path.commonpath([root, path]) == root:
+		return path
+	raise ValueError(f"audio source must be {AUDIO_FIFO} or a file in {AUDIO_DIR}/: {source!r}")
+
+
+class _PipeReader(io.RawIOBase):
+	"""
+	Raw reads from a pipe or stdin that never block for more than POLL: each
+	read waits in select() and reports EOF once halt is set, so a reader
+	thread on an idle FIFO can still be stopped.
+	"""
+
+	def __init__(self, fd: int, halt: threading.Event, owned: bool = True):
+		self._fd = fd
+		self._halt = halt
+		self._owned = owned
+
+	def readable(self) -> bool:
+		return True
+
+	def fileno(self) -> int:
+		return self._fd
+
+	def readinto(self, b) -> int:
+		while not self._halt.is_set():
+			ready, _, _ = select.select([self._fd], [], [], POLL)
+			if not ready:
+				continue
+			try:
+				data = os.read(self._fd, len(b))
+			except BlockingIOError:
+				continue
+			b[:len(data)] = data
+			return len(data)
+		return 0
+
+	def close(self):
+		if self._owned and not self.closed:
+			os.close(self._fd)
+		super().close()
+
+
+class PCMSource:
+	"""
+	Reads mono float blocks from "-" (stdin), a named pipe or a file. WAV
+	headers are detected and used; anything else is raw s16le PCM.
+	"""
+
+	def __init__(self, source: str = "-", rate: Optional[int] = None, channels: Optional[int] = None,
+			halt: Optional[threading.Event] = None):
+		self.name = source
+		# pipes pace themselves; anything else (files, devices) is paced to real time
+		self.live = source == "-" or self._is_fifo(source)
+		halt = halt or threading.Event()
+		if source == "-":
+			raw = _PipeReader(sys.stdin.fileno(), halt, owned=False)
+		elif self.live:
+			# O_NONBLOCK: opening a FIFO no one writes to yet returns at once; reads wait in select()
+			raw = _PipeReader(os.open(source, os.O_RDONLY | os.O_NONBLOCK), halt)
+		else:
+			raw = open(source, "rb", buffering=0)
+		self._raw = raw
+		stream = io.BufferedReader(raw)
+		self._wav = None
+		if stream.peek(4)[:4] == b"RIFF":
+			self._wav = wave.open(stream, "rb")
+			self.rate = self._wav.getframerate()
+			self.channels = self._wav.getnchannels()
+			self.width = self._wav.getsampwidth()
+		else:
+			self.rate = int(rate or DEFAULT_RATE)
+			self.channels = int(channels or DEFAULT_CHANNELS)
+			self.width = 2
+		self._stream = stream
+
+	@staticmethod
+	def _is_fifo(path: str) -> bool:
+		try:
+			return stat.S_ISFIFO(os.stat(path).st_mode)
+		except OSError:
+			return False
+
+	def blocks(self, frames: int) -> Iterator[np.ndarray]:
+		"""Mono blocks of `frames` samples (the last one may be shorter) until EOF."""
+		size = frames * self.channels * self.width
+		while True:
+			if self._wav is not None:
+				data = self._wav.readframes(frames)
+			else:
+				data = self._stream.read(size)
+			if not data:
+				return
+			yield _decode(data, self.width, self.channels)
+
+	def close(self):
+		self._raw.close()
+
+
+# ---------- analysis ----------
+class SpectrumAnalyzer:
+	"""
+	Streaming band levels: a Hann-windowed FFT over the last fft_size samples,
+	recomputed every push(), folded into log-spaced bands with fast attack,
+	slow release and a per-band peak follower so quiet music still moves.
+	"""
+
+	def __init__(self, rate: int, bands: int = 16, fft_size: int = 2048,
+			fmin: float = 40.0, fmax: float = 16000.0, attack: float = 0.6, release: float = 0.15):
+		self.rate = rate
+		self.fft_size = fft_size
+		self.attack = attack
+		self.release = release
+		self._ring = np.zeros(fft_size, dtype=np.float32)
+		self._window = np.hanning(fft_size).astype(np.float32)
+		freqs = np.fft.rfftfreq(fft_size, 1.0 / rate)
+		edges = np.geomspace(fmin, min(fmax, rate / 2.0), bands + 1)
+		lo = np.searchsorted(freqs, edges[:-1])
+		hi = np.maximum(np.searchsorted(freqs, edges[1:]), lo + 1) # at least one bin per band
+		self._lo, self._hi = lo, np.minimum(hi, len(freqs))
+		self._peak = np.full(bands, 1e-6, dtype=np.float32)
+		self.levels = np.zeros(bands, dtype=np.float32)
+
+	def push(self, samples: np.ndarray) -> np.ndarray:
+		"""Feed the next hop of mono samples; returns the band levels (0..1)."""
+		n = len(samples)
+		if n >= self.fft_size:
+			self._ring[:] = samples[-self.fft_size:]
+		elif n:
+			self._ring[:-n] = self._ring[n:]
+			self._ring[-n:] = samples
+		power = np.abs(np.fft.rfft(self._ring * self._window)) ** 2
+		# band means from a cumulative sum: one pass whatever the band count
+		csum = np.concatenate(([0.0], np.cumsum(power)))
+		energy = np.sqrt((csum[self._hi] - csum[self._lo]) / (self._hi - self._lo)).astype(np.float32)
+
+		self._peak = np.maximum(energy, self._peak * 0.995)
+		target = energy / np.maximum(self._peak, 1e-6)
+		rate = np.where(target > self.levels, self.attack, self.release)
+		self.levels = self.levels + (target - self.levels) * rate
+		return self.levels
+
+
+# ---------- background feed ----------
+class AudioFeed:
+	"""
+	Reader thread: source -> analyzer, one hop per output frame. Files are
+	paced to real time; pipes and stdin arrive at their own rate. The render
+	loop only ever reads `levels`, the newest result.
+	"""
+
+	def __init__(self, source: str = "-", bands: int = 16, fps: float = 60.0,
+			rate: Optional[int] = None, channels: Optional[int] = None, loop: bool = False):
+		self.source = source
+		self.bands = bands
+		self.fps = fps
+		self.rate = rate
+		self.channels = channels
+		self.loop = loop
+		self.levels = np.zeros(bands, dtype=np.float32)
+		self.hops = 0
+		self.error: Optional[str] = None
+		self._halt = threading.Event()
+		self._thread: Optional[threading.Thread] = None
+
+	def start(self):
+		self._thread = threading.Thread(target=self._run, name="lights-audio", daemon=True)
+		self._thread.start()
+		return self
+
+	def stop(self):
+		self._halt.set()
+
+	def _run(self):
+		try:
+			while not self._halt.is_set():
+				self._play_once()
+				if not self.loop:
+					break
+		except Exception as e:
+			self.error = str(e)
+			print("lights audio error:", e)
+		self.levels = np.zeros(self.bands, dtype=np.float32)
+
+	def _play_once(self):
+		src = PCMSource(self.source, self.rate, self.channels, halt=self._halt)
+		try:
+			analyzer = SpectrumAnalyzer(src.rate, self.bands)
+			hop = max(1, int(round(src.rate / self.fps)))
+			t0 = time.monotonic()
+			for k, block in enumerate(src.blocks(hop)):
+				if self._halt.is_set():
+					return
+				self.levels = analyzer.push(block).copy()
+				self.hops += 1
+				if not src.live: # keep a file in step with the wall clock
+					wait = t0 + (k + 1) * hop / src.rate - time.monotonic()
+					if wait > 0:
+						self._halt.wait(wait)
+		finally:
+			src.close()
+
+
+def main(argv=None):
+	ap = argparse.ArgumentParser(description="Run the audio analysis on a WAV file / pipe without the strip.")
+	ap.add_argument("source", help="WAV file, named pipe, or - for stdin")
+	ap.add_argument("--fps", type=float, default=60.0)
+	ap.add_argument("--bands", type=int, default=16)
+	ap.add_argument("--rate", type=int, help="raw PCM sample rate (ignored for WAV)")
+	ap.add_argument("--channels", type=int, help="raw PCM channels (ignored for WAV)")
+	args = ap.parse_args(argv)
+
+	src = PCMSource(args.source, args.rate, args.channels)
+	analyzer = SpectrumAnalyzer(src.rate, args.bands)
+	hop = max(1, int(round(src.rate / args.fps)))
+	hops, samples = 0, 0
+	t = time.perf_counter()
+	for block in src.blocks(hop):
+		levels = analyzer.push(block)
+		hops += 1
+		samples += len(block)
+		if hops % int(args.fps) == 0:
+			print(" ".join(f"{v:4.2f}" for v in levels))
+	busy = time.perf_counter() - t
+	src.close()
+	audio_s = samples / src.rate
+	print(f"\n{hops} hops, {audio_s:.1f} s of audio at {src.rate} Hz in {busy:.2f} s "
+		f"({audio_s / busy if busy else 0:.0f}x real time, {busy / max(1, hops) * 1000:.3f} ms/hop)")
+
+
+if __name__ == "__main__":
+	main()
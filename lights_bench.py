@@ -0,0 +1,170 @@
+"""
+Headless benchmark for every Lights mode.
+
+Runs each mode on a VirtualStrip for N ticks at several strip lengths, driving
+the render loop by hand on a simulated clock, and writes the numbers to JSON
+so two versions can be compared:
+
+	python lights_bench.py --frames 600 --out bench_new.json --compare bench_old.json
+"""
+import argparse
+import json
+import platform
+import statistics
+import sys
+import time
+import tracemalloc
+from datetime import datetime, timezone
+
+import numpy as np
+
+from lights import Lights
+from lights_sim import VirtualStrip
+
+# name -> (start the mode, re-trigger every N seconds for one-shot cues or None)
+MODES = {
+	"pulse": (lambda L: L.pulse((0, 0, 255, 0), seconds=2.0), None),
+	"bounce": (lambda L: L.bounce((255, 0, 0, 0), tail=10, speed=0.01), None),
+	"wave": (lambda L: L.wave((0, 80, 200, 0), wavelength=18, speed=0.02), None),
+	"rainbow": (lambda L: L.rainbow(speed=0.01, step=2), None),
+	"fade_between": (lambda L: L.fade_between((255, 0, 180, 0), (255, 180, 0, 0), period=3.0), None),
+	"heart_pulse": (lambda L: L.heart_pulse(), 0.7),
+	"override_burn": (lambda L: L.override_burn(seconds=2.0), 2.2),
+	"weather_storm": (lambda L: L.weather("storm"), None),
+}
+
+DEFAULT_PIXELS = (60, 250, 1000)
+
+
+def _percentile(values, q: float) -> float:
+	if not values:
+		return 0.0
+	ordered = sorted(values)
+	k = min(len(ordered) - 1, max(0, int(round(q * (len(ordered) - 1)))))
+	return ordered[k]
+
+
+def _make(num: int, fps: float) -> Lights:
+	# small capture ring: we only need the strip to behave, not to keep history
+	return Lights(num_pixels=num, fps=fps, pixels=VirtualStrip(num, capacity=4), autostart=False)
+
+
+def _drive(L: Lights, start, retrigger, frames: int, fps: float, t0: float = 0.0, on_tick=None):
+	"""Tick the engine `frames` times on a simulated clock; returns per-tick wall times."""
+	engine = L.engine
+	start(L)
+	last_trigger = t0
+	times = []
+	for k in range(frames):
+		now = t0 + k / fps
+		if retrigger and now - last_trigger >= retrigger:
+			start(L)
+			last_trigger = now
+		if on_tick:
+			on_tick()
+		t = time.perf_counter()
+		engine.render_once(now)
+		engine.output.pump(0.0)
+		times.append(time.perf_counter() - t)
+	return times
+
+
+def bench_mode(name: str, num: int, frames: int, fps: float) -> dict:
+	start, retrigger = MODES[name]
+
+	# timed pass
+	L = _make(num, fps)
+	_drive(L, start, retrigger, min(frames, 30), fps) # warm the frame-table cache
+	L = _make(num, fps)
+	times = _drive(L, start, retrigger, frames, fps)
+
+	# allocation pass (tracemalloc slows everything down, so it is kept separate)
+	peaks = []
+	L2 = _make(num, fps)
+	tracemalloc.start()
+	try:
+		def _mark():
+			# peak above the current level since the last mark = transient bytes of one tick
+			cur, peak = tracemalloc.get_traced_memory()
+			peaks.append(peak - cur)
+			tracemalloc.reset_peak()
+		_drive(L2, start, retrigger, min(frames, 300), fps, on_tick=_mark)
+	finally:
+		tracemalloc.stop()
+
+	out = L.engine.output.stats()
+	busy = sum(times)
+	return {
+		"mode": name,
+		"pixels": num,
+		"frames": frames,
+		"ticks_per_s": frames / busy if busy else 0.0,
+		"p50_ms": _percentile(times, 0.50) * 1000,
+		"p99_ms": _percentile(times, 0.99) * 1000,
+		"max_ms": max(times) * 1000 if times else 0.0,
+		"alloc_bytes_per_frame": statistics.mean(peaks[1:]) if len(peaks) > 1 else 0.0,
+		# share of one core the mode needs at the target rate (ticks run back to back here)
+		"cpu_pct": 100.0 * busy / (frames / fps) if frames else 0.0,
+		"shown": out["sent"],
+		"skipped": out["skipped"],
+	}
+
+
+def run(modes, pixel_counts, frames: int, fps: float) -> dict:
+	results = []
+	for num in pixel_counts:
+		for name in modes:
+			r = bench_mode(name, num, frames, fps)
+			results.append(r)
+			print(f"{name:>14} {num:>5}px  {r['ticks_per_s']:>9.0f} ticks/s  "
+				f"p50 {r['p50_ms']:.3f} ms  p99 {r['p99_ms']:.3f} ms  "
+				f"{r['alloc_bytes_per_frame']:>8.0f} B/frame  cpu {r['cpu_pct']:.1f}%")
+	return {
+		"meta": {
+			"created": datetime.now(timezone.utc).isoformat(),
+			"python": sys.version.split()[0],
+			"numpy": np.__version__,
+			"platform": platform.platform(),
+			"machine": platform.machine(),
+			"frames": frames,
+			"fps": fps,
+		},
+		"results": results,
+	}
+
+
+def compare(new: dict, old: dict):
+	"""Print ticks/s and p99 ratios against an earlier results file."""
+	prev = {(r["mode"], r["pixels"]): r for r in old.get("results", [])}
+	print("\nvs previous run (ticks/s ratio, p99 ratio; >1.0 ticks/s is faster):")
+	for r in new["results"]:
+		o = prev.get((r["mode"], r["pixels"]))
+		if not o:
+			continue
+		speed = r["ticks_per_s"] / o["ticks_per_s"] if o["ticks_per_s"] else float("nan")
+		p99 = r["p99_ms"] / o["p99_ms"] if o["p99_ms"] else float("nan")
+		print(f"{r['mode']:>14} {r['pixels']:>5}px  x{speed:.2f} ticks/s  x{p99:.2f} p99")
+
+
+def main(argv=None):
+	ap = argparse.ArgumentParser(description="Benchmark Lights modes on a virtual strip.")
+	ap.add_argument("--frames", type=int, default=600, help="ticks per mode (default 600)")
+	ap.add_argument("--fps", type=float, default=60.0, help="simulated tick rate (default 60)")
+	ap.add_argument("--pixels", type=int, nargs="+", default=list(DEFAULT_PIXELS))
+	ap.add_argument("--modes", nargs="+", default=list(MODES), choices=list(MODES))
+	ap.add_argument("--out", default="bench_lights.json", help="where to write the JSON results")
+	ap.add_argument("--compare", help="earlier results JSON to compare against")
+	args = ap.parse_args(argv)
+
+	report = run(args.modes, args.pixels, args.frames, args.fps)
+	with open(args.out, "w", encoding="utf-8") as f:
+		json.dump(report, f, indent=2)
+	print(f"\nwrote {args.out}")
+
+	if args.compare:
+		with open(args.compare, "r", encoding="utf-8") as f:
+			compare(report, json.load(f))
+
+
+if __name__ == "__main__":
+	main()
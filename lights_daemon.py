@@ -0,0 +1,351 @@
+"""
+Lights daemon: one process owns the strip, everyone else talks to it.
+
+	python lights_daemon.py # on the Pi, before the web app
+	SMARTMIRROR_LIGHTS_SOCKET=/tmp/smartmirror-lights.sock gunicorn -w 4 app:app
+
+Commands go over a unix socket as one JSON object per line:
+	{"call": "pulse", "args": [[0, 0, 255, 0], 2.0], "kwargs": {}, "segment": null}
+	-> {"ok": true, "result": null} | {"ok": false, "error": "..."}
+A command with "bytes": n is followed by n raw bytes, passed as its first
+argument (show_frame sends RGBW frames this way, no JSON encoding).
+
+The frame the strip is showing is published in shared memory, so any process
+can read it for previews without a round trip.
+"""
+import argparse
+import json
+import os
+import signal
+import socket
+import socketserver
+import struct
+import threading
+import time
+from typing import Optional
+
+import numpy as np
+
+SOCKET_PATH = os.environ.get("SMARTMIRROR_LIGHTS_SOCKET", "/tmp/smartmirror-lights.sock")
+SHM_NAME = os.environ.get("SMARTMIRROR_LIGHTS_SHM", "smartmirror-lights")
+
+# what a client may call; anything else is refused by the daemon
+COMMANDS = {
+	"off", "stop", "set_color", "set_brightness", "pulse", "bounce", "wave", "rainbow",
+	"fade_between", "heart_pulse", "override_burn", "weather", "spotify_mode", "timeline",
+	"pause", "resume", "remove_segment", "stats", "show_frame", "num", "audio",
+	"clear_cues",
+}
+
+# shared frame layout: u32 seq (odd while writing), u32 num, then num * 4 RGBW bytes
+_HEADER = struct.Struct("<II")
+REATTACH_S = 1.0 # a reader whose seq hasn't moved this long reopens the block (the daemon may have restarted)
+_SHM_DIR = "/dev/shm" # where Linux keeps POSIX shared memory
+
+
+# ---------- shared-memory frame ----------
+def _attach(name: str):
+	from multiprocessing import shared_memory
+	try:
+		return shared_memory.SharedMemory(name=name, track=False) # Python 3.13+
+	except TypeError:
+		shm = shared_memory.SharedMemory(name=name)
+		_untrack(shm) # the reader must not unlink the daemon's block when it exits
+		return shm
+
+
+def _untrack(shm):
+	"""Keep multiprocessing's resource tracker from unlinking shm when this process exits."""
+	from multiprocessing import resource_tracker
+	resource_tracker.unregister(shm._name, "shared_memory")
+
+
+class FramePublisher:
+	"""Daemon side: copy every frame sent to the strip into shared memory (seqlock)."""
+
+	def __init__(self, num: int, name: str = SHM_NAME):
+		from multiprocessing import shared_memory
+		size = _HEADER.size + num * 4
+		try:
+			self.shm = shared_memory.SharedMemory(name=name, create=True, size=size)
+		except FileExistsError: # left over from a daemon that didn't shut down cleanly
+			old = shared_memory.SharedMemory(name=name)
+			old.close()
+			old.unlink()
+			self.shm = shared_memory.SharedMemory(name=name, create=True, size=size)
+		self.name = name
+		self.num = num
+		self.seq = 0
+		self._ino = os.fstat(self.shm._fd).st_ino # which block is ours, should a newer daemon reuse the name
+		self._pixels = np.ndarray((num, 4), dtype=np.uint8, buffer=self.shm.buf, offset=_HEADER.size)
+		_HEADER.pack_into(self.shm.buf, 0, self.seq, num)
+
+	def write(self, frame: np.ndarray):
+		self.seq += 1 # odd: readers retry
+		_HEADER.pack_into(self.shm.buf, 0, self.seq, self.num)
+		np.copyto(self._pixels, frame)
+		self.seq += 1
+		_HEADER.pack_into(self.shm.buf, 0, self.seq, self.num)
+
+	def _still_ours(self) -> bool:
+		if not os.path.isdir(_SHM_DIR):
+			return True # can't tell off Linux
+		try:
+			return os.stat(os.path.join(_SHM_DIR, self.name)).st_ino == self._ino
+		except FileNotFoundError:
+			return False
+
+	def close(self):
+		self._pixels = None
+		if self._still_ours():
+			try:
+				self.shm.unlink()
+			except FileNotFoundError:
+				pass
+		else: # a daemon started after us owns the name now: leave its block alone
+			_untrack(self.shm)
+		self.shm.close()
+
+
+class FrameReader:
+	"""Client side: consistent copy of the daemon's current frame."""
+
+	def __init__(self, name: str = SHM_NAME):
+		self.shm = _attach(name)
+		self.seq = None
+		self.moved_at = time.monotonic() # last time seq changed
+
+	def read(self, retries: int = 100) -> Optional[np.ndarray]:
+		buf = self.shm.buf
+		for _ in range(retries):
+			seq, num = _HEADER.unpack_from(buf, 0)
+			if seq != self.seq:
+				self.seq, self.moved_at = seq, time.monotonic()
+			if seq & 1:
+				continue
+			frame = np.frombuffer(buf, dtype=np.uint8, count=num * 4, offset=_HEADER.size).reshape(num, 4).copy()
+			if _HEADER.unpack_from(buf, 0)[0] == seq:
+				return frame
+		return None
+
+	def close(self):
+		self.shm.close()
+
+
+# ---------- server ----------
+class _Handler(socketserver.StreamRequestHandler):
+	def handle(self):
+		for line in self.rfile:
+			if not line.strip():
+				continue
+			try:
+				msg = json.loads(line)
+				if msg.get("bytes"):
+					msg["args"] = [self.rfile.read(int(msg["bytes"]))] + list(msg.get("args", ()))
+				reply = {"ok": True, "result": self.server.dispatch(msg)}
+			except Exception as e:
+				reply = {"ok": False, "error": str(e)}
+			self.wfile.write((json.dumps(reply) + "\n").encode("utf-8"))
+			self.wfile.flush()
+
+
+class LightsServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+	daemon_threads = True
+
+	def __init__(self, lights, path: str = SOCKET_PATH, wait: float = 3.0):
+		deadline = time.monotonic() + wait # an old daemon may still be shutting down
+		while os.path.exists(path):
+			probe = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+			try:
+				probe.connect(path)
+			except OSError:
+				try:
+					os.unlink(path) # left over from a daemon that died
+				except FileNotFoundError:
+					pass
+				break
+			finally:
+				probe.close()
+			if time.monotonic() >= deadline:
+				raise RuntimeError(f"another lights daemon is already listening on {path}")
+			time.sleep(0.1)
+		super().__init__(path, _Handler)
+		os.chmod(path, 0o660)
+		self.path = path
+		self._ino = os.stat(path).st_ino
+		self.lights = lights
+		self._lock = threading.Lock() # one command at a time into Lights
+
+	def remove_socket(self):
+		"""Unlink the socket path unless a newer daemon has bound its own there since."""
+		try:
+			if os.stat(self.path).st_ino == self._ino:
+				os.unlink(self.path)
+		except FileNotFoundError:
+			pass
+
+	def dispatch(self, msg: dict):
+		call = msg.get("call")
+		if call not in COMMANDS:
+			raise ValueError(f"unknown command: {call}")
+		with self._lock:
+			target = self.lights
+			if msg.get("segment"):
+				target = self.lights.segment(msg["segment"], *(msg.get("range") or ()))
+			if call == "num":
+				return target.num
+			return getattr(target, call)(*msg.get("args", ()), **msg.get("kwargs", {}))
+
+
+def serve(path: str = SOCKET_PATH, shm_name: str = SHM_NAME):
+	from lights import create_lights
+	L = create_lights()
+	server = LightsServer(L, path) # first: refuses to start while another daemon is running
+	publisher = FramePublisher(L.num, shm_name)
+	L.engine.output.on_show = publisher.write
+
+	def _stop(*_):
+		threading.Thread(target=server.shutdown, daemon=True).start()
+	signal.signal(signal.SIGTERM, _stop)
+	signal.signal(signal.SIGINT, _stop)
+
+	print(f"lights daemon: {L.num} pixels, socket {path}, frame shm {shm_name}")
+	try:
+		server.serve_forever()
+	finally:
+		server.server_close()
+		L.off(transition=0) # no crossfade: close() shows this frame once, synchronously
+		L.close()
+		server.remove_socket()
+		publisher.close()
+
+
+# ---------- client ----------
+class LightsClient:
+	"""
+	Same calls as lights.Lights, forwarded to the daemon. Safe to create before
+	a fork (gunicorn): each process opens its own connection on first use.
+	"""
+	remote = True
+
+	def __init__(self, path: str = SOCKET_PATH, shm_name: str = SHM_NAME, timeout: float = 2.0,
+			segment: Optional[str] = None, span=None):
+		self.path = path
+		self.shm_name = shm_name
+		self.timeout = timeout
+		self._segment = segment
+		self._span = span
+		self._sock: Optional[socket.socket] = None
+		self._file = None
+		self._pid = None
+		self._lock = threading.Lock()
+		self._reader: Optional[FrameReader] = None
+		self._reader_lock = threading.Lock()
+		self._num: Optional[int] = None
+
+	def _connect(self):
+		self._close()
+		s = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+		s.settimeout(self.timeout)
+		s.connect(self.path)
+		self._sock, self._file, self._pid = s, s.makefile("rb"), os.getpid()
+
+	def _close(self):
+		if self._sock is not None:
+			try:
+				self._file.close()
+				self._sock.close()
+			except OSError:
+				pass
+		self._sock = self._file = None
+
+	def _request(self, msg: dict, payload: bytes = b""):
+		data = (json.dumps(msg) + "\n").encode("utf-8") + payload
+		with self._lock:
+			for attempt in (1, 2): # reconnect once if the daemon restarted
+				try:
+					if self._sock is None or self._pid != os.getpid():
+						self._connect()
+					self._sock.sendall(data)
+					line = self._file.readline()
+					if not line:
+						raise ConnectionError("lights daemon closed the connection")
+					break
+				except OSError:
+					self._close()
+					if attempt == 2:
+						raise
+		reply = json.loads(line)
+		if not reply.get("ok"):
+			raise ValueError(reply.get("error") or "lights daemon error")
+		return reply.get("result")
+
+	def call(self, name: str, *args, payload: bytes = b"", **kwargs):
+		msg = {"call": name, "args": list(args), "kwargs": kwargs}
+		if payload:
+			msg["bytes"] = len(payload)
+		if self._segment:
+			msg["segment"] = self._segment
+			msg["range"] = list(self._span) if self._span else None
+		return self._request(msg, payload)
+
+	@property
+	def num(self) -> int:
+		if self._num is None:
+			self._num = self.call("num")
+		return self._num
+
+	def show_frame(self, data):
+		self.call("show_frame", payload=bytes(data))
+
+	def __getattr__(self, name: str):
+		if name not in COMMANDS:
+			raise AttributeError(name)
+		return lambda *a, **k: self.call(name, *a, **k)
+
+	def segment(self, name: str, start: Optional[int] = None, stop: Optional[int] = None) -> "LightsClient":
+		span = (int(start), int(stop)) if start is not None and stop is not None else None
+		zone = LightsClient(self.path, self.shm_name, self.timeout, segment=name, span=span)
+		zone.call("stats") # the daemon validates the range (and rejects unknown names) here
+		return zone
+
+	def frame(self) -> Optional[np.ndarray]:
+		"""
+		Frame the strip is showing (before color correction), read from shared
+		memory. The block is reopened after a read error or when its seq has
+		stood still for REATTACH_S, so a restarted daemon's new block is picked
+		up. Raises ConnectionError if the daemon isn't running.
+		"""
+		with self._reader_lock:
+			reader = self._reader
+			if reader is not None and time.monotonic() - reader.moved_at <= REATTACH_S:
+				try:
+					return reader.read()
+				except (OSError, ValueError):
+					pass # fall through and reattach
+			self._drop_reader()
+			try:
+				self._reader = FrameReader(self.shm_name)
+			except FileNotFoundError:
+				raise ConnectionError("lights daemon is not running") from None
+			return self._reader.read()
+
+	def _drop_reader(self):
+		reader, self._reader = self._reader, None
+		if reader is not None:
+			try:
+				reader.close()
+			except (OSError, BufferError):
+				pass
+
+
+def main(argv=None):
+	ap = argparse.ArgumentParser(description="Own the LED strip and take commands over a unix socket.")
+	ap.add_argument("--socket", default=SOCKET_PATH)
+	ap.add_argument("--shm", default=SHM_NAME, help="shared memory name for the current frame")
+	args = ap.parse_args(argv)
+	serve(args.socket, args.shm)
+
+
+if __name__ == "__main__":
+	main()
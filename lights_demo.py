@@ -42,4 +42,5 @@ try:
 
 finally:
 	print("Off")
-	L.off()
+	L.off(transition=0)
+	L.close() # pushes the off frame before returning
@@ -0,0 +1,913 @@
+import math
+import threading
+import time
+from collections import OrderedDict
+from typing import Callable, Optional, Tuple
+
+import numpy as np
+
+import lights_frames as frames
+
+
+# ---------- animations ----------
+class Animation:
+	"""
+	A light mode as a pure function of its step number.
+	The render loop maps wall time to step = int(elapsed / interval) and only
+	pushes a new frame when the step changes.
+	"""
+	name = "animation"
+
+	def __init__(self, interval: float = math.inf, length: Optional[int] = None):
+		self.interval = interval # seconds per step (inf = never changes)
+		self.length = length # steps in a one-shot, which then holds its last frame (None = loops forever)
+		# where the render loop last drew it
+		self.elapsed = 0.0 # seconds into the animation (its phase)
+		self.step = 0 # frame index at that phase
+
+	def step_at(self, elapsed: float) -> int:
+		if not math.isfinite(self.interval) or self.interval <= 0:
+			return 0
+		return int(elapsed / self.interval)
+
+	def next_change(self, step: int) -> Optional[int]:
+		"""First step after `step` that can look different (None = never)."""
+		if not math.isfinite(self.interval) or self.interval <= 0:
+			return None
+		return step + 1
+
+	def due_after(self, step: int) -> float:
+		"""Seconds from the animation's start until it next needs a frame (inf = never)."""
+		nxt = self.next_change(step)
+		if self.length is not None:
+			nxt = self.length if nxt is None else min(nxt, self.length) # the end needs a tick too
+		return math.inf if nxt is None else nxt * self.interval
+
+	def render(self, step: int) -> np.ndarray:
+		raise NotImplementedError
+
+
+class Static(Animation):
+	"""One frame held until the next mode change."""
+	name = "static"
+
+	def __init__(self, frame: np.ndarray):
+		super().__init__()
+		self.frame = frame
+
+	def render(self, step: int) -> np.ndarray:
+		return self.frame
+
+
+def _changed_steps(table: np.ndarray, loop: bool, chunk: int = 64) -> np.ndarray:
+	"""Indices of frames that differ from the previous one, compared chunk frames at a time."""
+	n = len(table)
+	diff = np.zeros(n, dtype=bool)
+	axes = tuple(range(1, table.ndim))
+	for s in range(1, n, chunk):
+		e = min(n, s + chunk)
+		diff[s:e] = np.any(table[s:e] != table[s - 1:e - 1], axis=axes)
+	if loop and n > 1: # a one-shot doesn't wrap around
+		diff[0] = bool(np.any(table[0] != table[-1]))
+	return np.flatnonzero(diff)
+
+
+class Cycle(Animation):
+	"""Plays a precomputed table, looping unless it is a one-shot (loop=False)."""
+	name = "cycle"
+
+	def __init__(self, table: np.ndarray, interval: float, loop: bool = True):
+		super().__init__(interval, None if loop else len(table))
+		self.table = table
+		# steps whose frame differs from the one before (slow fades repeat frames a lot)
+		self._changes = _changed_steps(table, loop)
+
+	def next_change(self, step: int) -> Optional[int]:
+		n = len(self.table)
+		if not self._changes.size or not math.isfinite(self.interval):
+			return None
+		base, p = divmod(step, n)
+		i = int(np.searchsorted(self._changes, p, side="right"))
+		if i < self._changes.size:
+			return base * n + int(self._changes[i])
+		return (base + 1) * n + int(self._changes[0]) if self.length is None else None
+
+	def render(self, step: int) -> np.ndarray:
+		return self.table[step % len(self.table)]
+
+
+class SolidCycle(Cycle):
+	"""Cycle of whole-strip colors: an (n, 4) table, each row broadcast to num pixels when drawn."""
+	name = "solid_cycle"
+
+	def __init__(self, colors: np.ndarray, num: int, interval: float, loop: bool = True):
+		super().__init__(colors, interval, loop)
+		self.num = num
+
+	def render(self, step: int) -> np.ndarray:
+		# read-only view: the render loop copies before drawing segments / cues into it
+		return np.broadcast_to(self.table[step % len(self.table)], (self.num, frames.CHANNELS))
+
+
+class Live(Animation):
+	"""Renders each step on demand with fn(step) (modes that never repeat)."""
+	name = "live"
+
+	def __init__(self, fn: Callable[[int], np.ndarray], interval: float):
+		super().__init__(interval)
+		self.fn = fn
+
+	def render(self, step: int) -> np.ndarray:
+		return self.fn(step)
+
+
+# ---------- layers ----------
+class Layer:
+	"""
+	An animation drawn over the base mode with a blend mode and an opacity
+	envelope (fade in at the start, fade out at the end or when released).
+	"""
+
+	def __init__(self, anim: Animation, blend: str = "alpha", opacity: float = 1.0,
+			fade_in: float = 0.0, fade_out: float = 0.0, span: Optional[Tuple[int, int]] = None,
+			hold_base: bool = False):
+		if blend not in frames.BLEND_MODES:
+			raise ValueError(f"unknown blend mode: {blend}")
+		self.anim = anim
+		self.blend = blend
+		self.opacity = opacity
+		self.fade_in = fade_in
+		self.fade_out = fade_out
+		self.start = 0.0
+		self.release_at: Optional[float] = None # set when a looping layer is let go
+		self.span = span # (start, stop) pixels for a segment's cue, None = whole strip
+		self.hold_base = hold_base # pause what is underneath while this layer is up
+
+	def duration(self) -> Optional[float]:
+		if self.anim.length is None:
+			return None
+		return self.anim.length * self.anim.interval
+
+	def due_at(self, now: float) -> float:
+		"""Absolute time this layer next needs a frame (now while its envelope is ramping)."""
+		t = now - self.start
+		end = self._end()
+		if self.fade_in > 0 and t < self.fade_in:
+			return now
+		if end is not None and self.fade_out > 0 and end - self.fade_out <= t:
+			return now
+		due = self.start + self.anim.due_after(self.anim.step_at(t))
+		if end is not None:
+			due = min(due, self.start + end - self.fade_out) # fade-out starts (or the layer ends)
+		return due
+
+	def _end(self) -> Optional[float]:
+		"""Seconds after start when the layer is gone (None = not yet known)."""
+		end = self.duration()
+		if self.release_at is not None:
+			released = self.release_at - self.start + self.fade_out
+			end = released if end is None else min(end, released)
+		return end
+
+	def alpha_at(self, now: float) -> float:
+		"""Envelope value at `now`; <= 0 once the layer has fully faded out."""
+		t = now - self.start
+		a = self.opacity
+		if self.fade_in > 0:
+			a *= min(1.0, t / self.fade_in)
+		end = self._end()
+		if end is not None:
+			if t >= end:
+				return 0.0
+			if self.fade_out > 0:
+				a *= min(1.0, (end - t) / self.fade_out)
+		return max(0.0, a)
+
+
+# ---------- transitions ----------
+class Transition:
+	"""The outgoing animation, still drawn under the incoming one while it fades in."""
+
+	def __init__(self, old: Animation, old_start: float, start: float, duration: float):
+		self.old = old
+		self.old_start = old_start
+		self.start = start
+		self.duration = duration
+		self.last: Optional[np.ndarray] = None # the blend most recently drawn
+
+	def mix(self, now: float) -> float:
+		"""0 = all old, 1 = done (all new)."""
+		return min(1.0, (now - self.start) / self.duration)
+
+	def step_at(self, clock: float) -> int:
+		return self.old.step_at(clock - self.old_start)
+
+
+def _fade_from(anim: Animation, anim_start: float, fading: Optional[Transition], clock: float, now: float,
+		duration: float) -> Transition:
+	"""Crossfade away from anim; if anim is still fading in itself, from the blend on the strip."""
+	if fading is None:
+		return Transition(anim, anim_start, now, duration)
+	if fading.last is not None:
+		return Transition(Static(fading.last), clock, now, duration)
+	return Transition(fading.old, fading.old_start, now, duration) # not drawn yet: still all old
+
+
+# ---------- segments ----------
+class Segment:
+	"""
+	A pixel range [start, stop) running its own animation, written over the
+	base frame in the same pass (later segments win where ranges overlap).
+	"""
+
+	def __init__(self, start: int, stop: int, anim: Animation):
+		self.start = start
+		self.stop = stop
+		self.anim = anim
+		self.anim_start = 0.0
+		self.fade: Optional[Transition] = None # crossfade from the segment's previous mode
+
+	def step_at(self, now: float) -> int:
+		anim = self.anim
+		anim.elapsed = now - self.anim_start
+		step = anim.step_at(anim.elapsed)
+		if anim.length is not None:
+			step = min(step, anim.length - 1) # a finished one-shot holds its last frame
+		anim.step = step
+		return step
+
+	def due_at(self, now: float) -> float:
+		return self.anim_start + self.anim.due_after(self.anim.step_at(now - self.anim_start))
+
+
+# ---------- telemetry ----------
+class ModeStats:
+	"""Counters for one mode. Written by the render and output threads, read by /lights/stats."""
+	BUCKETS_MS = (1, 2, 5, 10, 17, 33, 50, 100) # frame-time histogram upper bounds
+
+	def __init__(self):
+		self.rendered = 0 # frames composited
+		self.shown = 0 # frames that went out with show()
+		self.skipped = 0 # identical to the previous frame, not sent
+		self.late = 0 # ticks missed because the loop fell behind
+		self.render_s = 0.0
+		self.lock_wait_s = 0.0 # waiting for the front/back buffer lock
+		self.show_s = 0.0 # inside write + pixels.show()
+		self.hist = [0] * (len(self.BUCKETS_MS) + 1)
+		self._last_show: Optional[float] = None
+		self._interval = None # EWMA of seconds between shows
+		self._chosen = None # EWMA of the tick period the governor picked
+
+	def add_render(self, seconds: float, lock_wait: float):
+		self.rendered += 1
+		self.render_s += seconds
+		self.lock_wait_s += lock_wait
+		ms = seconds * 1000.0
+		for i, bound in enumerate(self.BUCKETS_MS):
+			if ms <= bound:
+				self.hist[i] += 1
+				return
+		self.hist[-1] += 1
+
+	def add_tick(self, period: float):
+		self._chosen = period if self._chosen is None else self._chosen * 0.9 + period * 0.1
+
+	def add_show(self, seconds: float, now: float):
+		self.shown += 1
+		self.show_s += seconds
+		if self._last_show is not None:
+			dt = now - self._last_show
+			self._interval = dt if self._interval is None else self._interval * 0.9 + dt * 0.1
+		self._last_show = now
+
+	def as_dict(self) -> dict:
+		labels = [f"<={b}ms" for b in self.BUCKETS_MS] + [f">{self.BUCKETS_MS[-1]}ms"]
+		return {
+			"frames_rendered": self.rendered,
+			"frames_shown": self.shown,
+			"frames_skipped": self.skipped,
+			"late_frames": self.late,
+			"chosen_fps": (1.0 / self._chosen) if self._chosen else 0.0,
+			"achieved_fps": (1.0 / self._interval) if self._interval else 0.0,
+			"render_ms_avg": (self.render_s / self.rendered * 1000.0) if self.rendered else 0.0,
+			"lock_wait_ms_total": self.lock_wait_s * 1000.0,
+			"show_ms_total": self.show_s * 1000.0,
+			"show_ms_avg": (self.show_s / self.shown * 1000.0) if self.shown else 0.0,
+			"frame_time_histogram": dict(zip(labels, self.hist)),
+		}
+
+
+class Telemetry:
+	"""Per-mode ModeStats, created on first use."""
+
+	def __init__(self):
+		self._modes: "dict[str, ModeStats]" = {}
+
+	def mode(self, name: Optional[str]) -> ModeStats:
+		return self._modes.setdefault(name or "stopped", ModeStats())
+
+	def as_dict(self) -> dict:
+		return {name: m.as_dict() for name, m in list(self._modes.items())}
+
+
+# ---------- output ----------
+class FrameOutput:
+	"""
+	Last stage before the hardware, on its own thread. The render loop submits
+	into a back buffer and swaps; this thread copies out the front buffer,
+	maps it through the color LUT (gamma, brightness, white balance) and
+	pushes it, skipping frames identical to the last one sent. Nothing else
+	touches the pixels object, and no lock is held across show().
+
+	When the driver exposes its transmit buffer, frames are written straight
+	into it in wire byte order (pixel_order, e.g. "GRBW") with brightness
+	already in the LUT, so a frame costs no per-pixel Python objects.
+	"""
+
+	def __init__(self, pixels, num: int, brightness: float = 1.0, gamma: float = 1.0,
+			white_balance=(1.0, 1.0, 1.0, 1.0), telemetry: Optional[Telemetry] = None,
+			pixel_order: Optional[str] = None):
+		self.pixels = pixels
+		self.telemetry = telemetry or Telemetry()
+		self.pixels.brightness = 1.0 # brightness lives in the LUT, not in the driver
+		self.brightness = brightness
+		self.gamma = gamma
+		self.white_balance = tuple(white_balance)
+		self._order = np.array(frames.channel_order(pixel_order))
+		self._wire = frames.wire_view(pixels, num, len(self._order))
+		self._lut = None
+		self._wire_lut = None
+		self._set_lut(frames.build_lut(brightness, gamma, white_balance))
+		self._bufs = [frames.empty(num), frames.empty(num)] # front/back
+		self._tags: "list[Optional[str]]" = [None, None] # mode that produced each buffer
+		self._front = 0 # only the render thread flips this
+		self._seq = 0 # bumped on every swap
+		self._taken = 0 # last seq copied out by the output thread
+		self._cond = threading.Condition()
+		self._pending_lut: Optional[np.ndarray] = None
+		self._force = True # next frame goes out even if unchanged
+		self._work = frames.empty(num)
+		self._last = frames.empty(num)
+		self._halt = threading.Event()
+		self._thread: Optional[threading.Thread] = None
+		self.on_show: Optional[Callable[[np.ndarray], None]] = None # e.g. publish to lights_daemon's shared memory
+
+		self.sent = 0
+		self.skipped = 0 # identical to the last frame sent
+		self.superseded = 0 # swapped out before the output thread got to it
+
+	# ---------- producer side (render thread) ----------
+	def submit(self, frame: np.ndarray, tag: Optional[str] = None) -> float:
+		"""Copy frame into the back buffer and swap it to the front; returns seconds spent waiting for the lock."""
+		back = 1 - self._front
+		np.copyto(self._bufs[back], frame)
+		self._tags[back] = tag
+		t = time.perf_counter()
+		with self._cond:
+			waited = time.perf_counter() - t
+			if self._seq > self._taken:
+				self.superseded += 1
+			self._front ^= 1
+			self._seq += 1
+			self._cond.notify()
+		return waited
+
+	# ---------- control (any thread) ----------
+	def invalidate(self):
+		with self._cond:
+			self._force = True
+			self._cond.notify()
+
+	def set_levels(self, brightness: Optional[float] = None, gamma: Optional[float] = None, white_balance=None):
+		"""Rebuild the LUT once here; the output thread swaps it in before its next show()."""
+		with self._cond:
+			if brightness is not None:
+				self.brightness = brightness
+			if gamma is not None:
+				self.gamma = gamma
+			if white_balance is not None:
+				self.white_balance = tuple(white_balance)
+			self._pending_lut = frames.build_lut(self.brightness, self.gamma, self.white_balance)
+			self._cond.notify()
+
+	def set_brightness(self, value: float):
+		self.set_levels(brightness=value)
+
+	def start(self):
+		if self._thread and self._thread.is_alive():
+			return
+		self._halt.clear()
+		self._thread = threading.Thread(target=self._run, name="lights-output", daemon=True)
+		self._thread.start()
+
+	def shutdown(self, timeout: float = 1.0):
+		self._halt.set()
+		with self._cond:
+			self._cond.notify()
+		t = self._thread
+		if t and t.is_alive() and threading.current_thread() is not t:
+			t.join(timeout=timeout)
+
+	# ---------- output thread ----------
+	def _ready(self) -> bool:
+		return self._seq != self._taken or self._pending_lut is not None or (self._force and self._seq > 0)
+
+	def pump(self, timeout: Optional[float] = 0.0) -> bool:
+		"""Push the newest frame if there is one; returns True if show() ran."""
+		with self._cond:
+			if not self._ready() and timeout != 0.0:
+				self._cond.wait(timeout)
+			if not self._ready():
+				return False
+			np.copyto(self._work, self._bufs[self._front])
+			tag = self._tags[self._front]
+			self._taken = self._seq
+			lut, self._pending_lut = self._pending_lut, None
+			force, self._force = self._force, False
+
+		if lut is not None:
+			self._set_lut(lut)
+			force = True
+		if self._seq == 0:
+			return False # nothing submitted yet; the new LUT applies to the first frame
+		stats = self.telemetry.mode(tag)
+		if not force and np.array_equal(self._work, self._last):
+			self.skipped += 1
+			stats.skipped += 1
+			return False
+
+		np.copyto(self._last, self._work)
+		t = time.perf_counter()
+		if self._wire is not None:
+			frames.encode_wire(self._wire_lut, self._order, self._work, self._wire)
+		else:
+			frames.write_frame(self.pixels, frames.apply_lut(self._lut, self._work))
+		self.pixels.show()
+		done = time.perf_counter()
+		stats.add_show(done - t, done)
+		self.sent += 1
+		if self.on_show is not None:
+			self.on_show(self._last)
+		return True
+
+	def last_frame(self) -> np.ndarray:
+		"""Copy of the last frame sent, before color correction."""
+		return self._last.copy()
+
+	def _set_lut(self, lut: np.ndarray):
+		self._lut = lut
+		self._wire_lut = np.ascontiguousarray(lut[self._order]) # rows in wire byte order
+
+	def _run(self):
+		while not self._halt.is_set():
+			try:
+				self.pump(timeout=0.5)
+			except Exception as e:
+				print("lights output error:", e)
+
+	def stats(self) -> dict:
+		total = self.sent + self.skipped
+		return {
+			"sent": self.sent,
+			"skipped": self.skipped,
+			"superseded": self.superseded,
+			"skip_ratio": (self.skipped / total) if total else 0.0,
+			"path": "wire" if self._wire is not None else "pixels",
+		}
+
+
+# ---------- command mailbox ----------
+class Mailbox:
+	"""
+	Pending commands keyed by slot. Posting to a slot that is still pending
+	replaces it (latest wins), so a burst of slider/color-picker requests
+	collapses into one command applied on the next tick.
+	"""
+
+	def __init__(self):
+		self._pending: "OrderedDict[str, tuple]" = OrderedDict()
+		self._lock = threading.Lock()
+		self.posted = 0
+		self.coalesced = 0 # commands replaced before they were applied
+
+	def post(self, slot: str, kind: str, payload=None):
+		with self._lock:
+			self.posted += 1
+			if self._pending.pop(slot, None) is not None:
+				self.coalesced += 1
+			self._pending[slot] = (kind, payload)
+
+	def take(self) -> list:
+		"""All pending (kind, payload) in posting order, leaving the mailbox empty."""
+		with self._lock:
+			if not self._pending:
+				return []
+			items = list(self._pending.values())
+			self._pending.clear()
+			return items
+
+	def stats(self) -> dict:
+		return {"posted": self.posted, "coalesced": self.coalesced}
+
+
+# ---------- frame rate governor ----------
+class Governor:
+	"""
+	Caps the tick rate. The render loop sleeps until the next frame that can
+	look different, but never ticks faster than cap_fps; the cap backs off while
+	deadlines are being missed (e.g. the Pi is busy resizing an image) and
+	creeps back up once ticks are on time again.
+	"""
+	IDLE_S = 0.5 # longest sleep when nothing is due (commands wake the loop anyway)
+
+	def __init__(self, max_fps: float, min_fps: float = 10.0):
+		self.max_fps = max_fps
+		self.min_fps = min(min_fps, max_fps)
+		self.cap_fps = max_fps
+		self.backoffs = 0
+		self._late = 0.0 # EWMA of the fraction of late ticks
+
+	@property
+	def period(self) -> float:
+		return 1.0 / self.cap_fps
+
+	def record(self, lag: float):
+		"""lag = how far past its deadline a tick started."""
+		late = lag > self.period * 0.5
+		self._late = self._late * 0.9 + (0.1 if late else 0.0)
+		if self._late > 0.3 and self.cap_fps > self.min_fps:
+			self.cap_fps = max(self.min_fps, self.cap_fps * 0.75)
+			self.backoffs += 1
+			self._late = 0.0
+		elif not late and self._late < 0.01 and self.cap_fps < self.max_fps:
+			self.cap_fps = min(self.max_fps, self.cap_fps * 1.02)
+
+	def stats(self) -> dict:
+		return {
+			"max_fps": self.max_fps,
+			"min_fps": self.min_fps,
+			"cap_fps": self.cap_fps,
+			"backoffs": self.backoffs,
+		}
+
+
+# ---------- render loop ----------
+class RenderLoop:
+	"""
+	One long-lived thread that owns the strip. It ticks when the next visible
+	change is due (at most `fps`, see Governor), and takes mode changes as
+	messages so callers never block.
+	"""
+
+	def __init__(self, pixels, num: int, fps: float = 60.0, **levels):
+		self.pixels = pixels
+		self.telemetry = Telemetry()
+		# levels: brightness, gamma, white_balance (and the output's pixel_order)
+		self.output = FrameOutput(pixels, num, telemetry=self.telemetry, **levels)
+		self.num = num
+		self.fps = float(fps)
+		self.mailbox = Mailbox()
+		self.governor = Governor(self.fps)
+		self._halt = threading.Event()
+		self._wake = threading.Event() # a command was posted
+		self._thread: Optional[threading.Thread] = None
+
+		self._anim: Optional[Animation] = None
+		self._anim_start = 0.0
+		self._overlays: "dict[str, Layer]" = {} # key -> layer, drawn in insertion order
+		self._segments: "dict[str, Segment]" = {} # name -> segment, drawn in insertion order
+		self._base_frame: Optional[np.ndarray] = None
+		self._base_step: Optional[int] = None
+		self._last_key: Optional[tuple] = None
+		self._xfade: Optional[Transition] = None # crossfade from the previous base mode
+		self._paused = False # pause() / resume()
+		self._frozen_at: Optional[float] = None # when the base and segment clocks stopped
+
+		self.ticks = 0 # ticks that ran
+		self.shown = 0 # frames composited and handed to the output stage
+		self.dropped = 0 # ticks skipped because we fell behind
+		self._started_at = 0.0
+
+	# ---------- control (any thread) ----------
+	def start(self):
+		if self._thread and self._thread.is_alive():
+			return
+		self._halt.clear()
+		self._started_at = time.monotonic()
+		self._thread = threading.Thread(target=self._run, name="lights-render", daemon=True)
+		self._thread.start()
+		self.output.start()
+
+	def shutdown(self, timeout: float = 1.0):
+		"""Stop both threads, then apply what is still pending (e.g. a last off()) and push it to the strip."""
+		self._halt.set()
+		self._wake.set()
+		t = self._thread
+		if t and t.is_alive() and threading.current_thread() is not t:
+			t.join(timeout=timeout)
+		self.output.shutdown(timeout)
+		if (t and t.is_alive()) or (self.output._thread and self.output._thread.is_alive()):
+			return # a thread is stuck mid-frame: don't render or show() alongside it
+		now = time.monotonic()
+		self._drain(now)
+		# no ticks are left to play fade-outs: cues that were let go (e.g. by off()) go now
+		for key in [k for k, layer in self._overlays.items() if layer.release_at is not None]:
+			del self._overlays[key]
+		self._last_key = None
+		self._safe_render(now)
+		try:
+			self.output.pump()
+		except Exception as e:
+			print("lights output error:", e)
+
+	def post(self, kind: str, payload=None, slot: Optional[str] = None):
+		"""Leave a command for the next tick (latest wins per slot); never blocks."""
+		self.mailbox.post(slot or kind, kind, payload)
+		self._wake.set()
+
+	def set_animation(self, anim, transition: float = 0.0):
+		"""
+		Replace the running mode. anim is an Animation, a zero-arg callable that
+		builds one (only called if this command wins), or None to stop animating
+		and leave the strip as is. transition > 0 crossfades from the old mode
+		over that many seconds (both are rendered each frame meanwhile).
+		"""
+		self.post("mode", (anim, transition))
+
+	def set_levels(self, **levels):
+		"""brightness / gamma / white_balance; the LUT is rebuilt once per tick at most."""
+		for name, value in levels.items():
+			self.post("levels", {name: value}, slot=f"levels:{name}")
+
+	def set_segment(self, name: str, start: int, stop: int, anim, transition: float = 0.0):
+		"""
+		Run anim (Animation, builder or None to remove) on pixels [start, stop)
+		only; its frames are stop - start pixels long. transition crossfades
+		from the segment's previous mode, as for set_animation().
+		"""
+		if not 0 <= start < stop <= self.num:
+			raise ValueError(f"segment {name!r} range {start}..{stop} is outside 0..{self.num}")
+		self.post("segment", (name, start, stop, anim, transition), slot=f"segment:{name}")
+
+	def add_overlay(self, key: str, layer: Layer):
+		"""Draw layer over the base mode; replaces any overlay with the same key."""
+		self.post("overlay", (key, layer), slot=f"overlay:{key}")
+
+	def pause(self):
+		"""Freeze the base mode and segments on their current frame (overlays keep playing)."""
+		self.post("pause", True)
+
+	def resume(self):
+		"""Carry on from the frame pause() stopped at."""
+		self.post("pause", False)
+
+	def invalidate(self):
+		"""Force the next frame out even if it matches the last one sent."""
+		self.post("invalidate")
+
+	def release_overlay(self, key: str):
+		"""Fade out (per the layer's fade_out) and drop the overlay with this key."""
+		self.post("release", key, slot=f"overlay:{key}")
+
+	def release_overlays(self, prefix: str = ""):
+		"""release_overlay() every overlay whose key starts with prefix ("" = all of them)."""
+		self.post("release_all", prefix, slot=f"release_all:{prefix}")
+
+	# ---------- render thread ----------
+	def _handle(self, kind: str, payload, now: float):
+		clock = now if self._frozen_at is None else self._frozen_at
+		if kind == "mode":
+			anim, transition = payload
+			if callable(anim):
+				anim = anim()
+			fading, self._xfade = self._xfade, None
+			if anim is not None and transition > 0:
+				if self._anim is not None:
+					self._xfade = _fade_from(self._anim, self._anim_start, fading, clock, now, transition)
+				elif self._base_frame is not None: # fade from the last look
+					self._xfade = Transition(Static(self._base_frame), clock, now, transition)
+			self._anim = anim
+			self._anim_start = clock
+			if anim is not None:
+				self._base_frame = None # None keeps the last look under any overlays
+			self._last_key = None
+		elif kind == "segment":
+			name, start, stop, anim, transition = payload
+			old = self._segments.pop(name, None)
+			if callable(anim):
+				anim = anim()
+			if anim is not None:
+				seg = Segment(start, stop, anim)
+				seg.anim_start = clock
+				if old is not None and transition > 0 and (old.start, old.stop) == (start, stop):
+					seg.fade = _fade_from(old.anim, old.anim_start, old.fade, clock, now, transition)
+				self._segments[name] = seg
+			self._last_key = None
+		elif kind == "overlay":
+			key, layer = payload
+			layer.start = now
+			self._overlays.pop(key, None)
+			self._overlays[key] = layer
+		elif kind == "pause":
+			self._paused = bool(payload)
+		elif kind == "invalidate":
+			self.output.invalidate()
+			self._last_key = None
+		elif kind == "release":
+			layer = self._overlays.get(payload)
+			if layer is not None and layer.release_at is None:
+				layer.release_at = now
+		elif kind == "release_all":
+			for key, layer in self._overlays.items():
+				if key.startswith(payload) and layer.release_at is None:
+					layer.release_at = now
+
+	def _drain(self, now: float):
+		# take() empties every slot: a command that fails must only drop itself, not the rest of the batch
+		levels = {}
+		for kind, payload in self.mailbox.take():
+			if kind == "levels":
+				levels.update(payload)
+				continue
+			try:
+				self._handle(kind, payload, now)
+			except Exception as e:
+				print(f"lights command error ({kind}):", e)
+		if levels:
+			try:
+				self.output.set_levels(**levels)
+			except Exception as e:
+				print("lights command error (levels):", e)
+
+	def render_once(self, now: float):
+		"""Apply pending messages and composite the frame due at `now`."""
+		self._drain(now)
+		self.ticks += 1
+
+		# overlays: drop finished ones, note the step/alpha each one is at
+		layers = []
+		for key, layer in list(self._overlays.items()):
+			alpha = layer.alpha_at(now)
+			step = layer.anim.step_at(now - layer.start)
+			done = layer.anim.length is not None and step >= layer.anim.length
+			if done or (layer.release_at is not None and alpha <= 0.0):
+				del self._overlays[key]
+				self._last_key = None # the strip has to drop the overlay's last look
+				continue
+			layers.append((layer, step, alpha))
+
+		# base and segments run on a clock that stops while paused or held by a cue
+		frozen = self._paused or any(layer.hold_base for layer, _, _ in layers)
+		if frozen and self._frozen_at is None:
+			self._frozen_at = now
+		elif not frozen and self._frozen_at is not None:
+			held = now - self._frozen_at
+			self._anim_start += held
+			if self._xfade is not None:
+				self._xfade.old_start += held
+			for seg in self._segments.values():
+				seg.anim_start += held
+				if seg.fade is not None:
+					seg.fade.old_start += held
+			self._frozen_at = None
+		clock = self._frozen_at if frozen else now
+
+		anim = self._anim
+		base_step = None
+		if anim is not None:
+			anim.elapsed = clock - self._anim_start
+			base_step = anim.step_at(anim.elapsed)
+			if anim.length is not None:
+				base_step = min(base_step, anim.length - 1) # a finished one-shot holds its last frame
+			anim.step = base_step
+
+		# crossfades: (old step, mix) while one is running
+		xfade = None
+		if self._xfade is not None:
+			mix = self._xfade.mix(now)
+			if mix >= 1.0:
+				self._xfade = None
+			else:
+				xfade = (self._xfade.step_at(clock), round(mix, 3))
+
+		segments = []
+		for seg in self._segments.values():
+			fade = None
+			if seg.fade is not None:
+				mix = seg.fade.mix(now)
+				if mix >= 1.0:
+					seg.fade = None
+				else:
+					fade = (seg.fade.step_at(clock), round(mix, 3))
+			segments.append((seg, seg.step_at(clock), fade))
+
+		if anim is None and not layers and not segments and self._base_frame is None:
+			return # nothing has been drawn yet
+
+		# nothing visible changed since the last push -> skip
+		key = (base_step,
+			tuple((id(l), s, round(a, 3)) for l, s, a in layers),
+			tuple((id(seg), s, f) for seg, s, f in segments),
+			xfade)
+		if key == self._last_key:
+			return
+		self._last_key = key
+
+		t = time.perf_counter()
+		if anim is not None and (self._base_frame is None or key[0] != self._base_step):
+			self._base_frame = anim.render(base_step)
+			self._base_step = base_step
+		frame = self._base_frame if self._base_frame is not None else frames.empty(self.num)
+		if xfade is not None:
+			frame = self._xfade.last = frames.composite(self._xfade.old.render(xfade[0]), frame, "alpha", xfade[1])
+		if segments:
+			if frame is self._base_frame or not frame.flags.writeable:
+				frame = frame.copy() # cached frames and tables stay clean for the next tick
+			for seg, step, fade in segments:
+				top = seg.anim.render(step)
+				if fade is not None:
+					top = seg.fade.last = frames.composite(seg.fade.old.render(fade[0]), top, "alpha", fade[1])
+				frame[seg.start:seg.stop] = top
+		for layer, step, alpha in layers:
+			if layer.span is None:
+				frame = frames.composite(frame, layer.anim.render(step), layer.blend, alpha)
+				continue
+			if frame is self._base_frame or not frame.flags.writeable:
+				frame = frame.copy()
+			a, b = layer.span
+			frame[a:b] = frames.composite(frame[a:b], layer.anim.render(step), layer.blend, alpha)
+		rendered = time.perf_counter() - t
+		self._show(frame, rendered)
+
+	def _mode_name(self) -> Optional[str]:
+		return getattr(self._anim, "name", None)
+
+	def _show(self, frame: np.ndarray, render_s: float = 0.0):
+		self.shown += 1
+		name = self._mode_name()
+		waited = self.output.submit(frame, name)
+		self.telemetry.mode(name).add_render(render_s, waited)
+
+	def _safe_render(self, now: float):
+		try:
+			self.render_once(now)
+		except Exception as e:
+			print("lights render error:", e)
+			self._anim = None
+
+	def next_due(self, now: float) -> float:
+		"""Earliest absolute time anything on the strip can change (inf = nothing scheduled)."""
+		if self._xfade is not None or any(seg.fade is not None for seg in self._segments.values()):
+			return now # crossfading: every tick counts
+		due = math.inf
+		for layer in self._overlays.values():
+			due = min(due, layer.due_at(now))
+		if self._frozen_at is None: # paused or held: the base and segments can't change
+			if self._anim is not None:
+				due = min(due, self._anim_start + self._anim.due_after(self._anim.step))
+			for seg in self._segments.values():
+				due = min(due, seg.due_at(now))
+		return due
+
+	def _run(self):
+		deadline = time.monotonic()
+		while not self._halt.is_set():
+			start = time.monotonic()
+			lag = start - deadline
+			if lag > self.governor.period:
+				# late: count the ticks we missed instead of rushing to catch up
+				missed = int(lag / self.governor.period)
+				self.dropped += missed
+				self.telemetry.mode(self._mode_name()).late += missed
+			self.governor.record(max(0.0, lag))
+			self._safe_render(start)
+
+			# sleep until the next visible change, but at least one capped period and at most IDLE_S
+			period = self.governor.period
+			now = time.monotonic()
+			deadline = min(max(self.next_due(now), start + period), now + Governor.IDLE_S)
+			self.telemetry.mode(self._mode_name()).add_tick(deadline - start)
+			if self._wake.wait(max(0.0, deadline - time.monotonic())):
+				# a command: apply it on the next capped tick so a burst collapses into one
+				self._wake.clear()
+				deadline = max(time.monotonic(), start + period)
+				self._halt.wait(max(0.0, deadline - time.monotonic()))
+
+	def stats(self) -> dict:
+		elapsed = max(1e-9, time.monotonic() - self._started_at) if self._started_at else 0.0
+		return {
+			"target_fps": self.fps,
+			"governor": self.governor.stats(),
+			"ticks": self.ticks,
+			"shown": self.shown,
+			"output": self.output.stats(),
+			"dropped": self.dropped,
+			"tick_rate": (self.ticks / elapsed) if elapsed else 0.0,
+			"mode": self._mode_name(),
+			"paused": self._frozen_at is not None,
+			"overlays": list(self._overlays),
+			"segments": {name: {"start": seg.start, "stop": seg.stop, "mode": getattr(seg.anim, "name", None)}
+				for name, seg in list(self._segments.items())},
+			"modes": self.telemetry.as_dict(),
+			"commands": self.mailbox.stats(),
+		}
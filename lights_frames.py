@@ -0,0 +1,293 @@
+import threading
+from collections import OrderedDict
+from math import gcd
+from typing import Optional
+
+import numpy as np
+
+# A frame is one (num, 4) uint8 array: one RGBW row per pixel.
+CHANNELS = 4
+
+
+# ---------- frame builders ----------
+def _to_u8(a) -> np.ndarray:
+	return np.clip(a, 0, 255).astype(np.uint8)
+
+
+def empty(num: int) -> np.ndarray:
+	return np.zeros((num, CHANNELS), dtype=np.uint8)
+
+
+def solid(num: int, color) -> np.ndarray:
+	"""Whole strip set to one color."""
+	frame = empty(num)
+	frame[:] = _to_u8(np.asarray(color, dtype=np.float64))
+	return frame
+
+
+def scaled(num: int, color, t: float) -> np.ndarray:
+	"""Whole strip set to color * t (truncated like int(v * t))."""
+	c = np.asarray(color, dtype=np.float64) * float(t)
+	return solid(num, c.astype(np.int32))
+
+
+def from_bytes(data, num: int) -> np.ndarray:
+	"""(num, 4) frame from raw RGBW bytes (bytes / bytearray / memoryview), copied once."""
+	buf = np.frombuffer(data, dtype=np.uint8)
+	if buf.size != num * CHANNELS:
+		raise ValueError(f"expected {num * CHANNELS} bytes ({num} pixels x RGBW), got {buf.size}")
+	return buf.reshape(num, CHANNELS).copy()
+
+
+def wheel_array(pos: np.ndarray) -> np.ndarray:
+	"""Vectorized lights.wheel(): positions 0..255 -> (len(pos), 4) colors."""
+	pos = np.asarray(pos, dtype=np.int32) & 255
+	out = np.zeros((pos.shape[0], CHANNELS), dtype=np.int32)
+
+	a = pos < 85
+	b = (pos >= 85) & (pos < 170)
+	c = pos >= 170
+	pa, pb, pc = pos[a], pos[b] - 85, pos[c] - 170
+
+	out[a, 0] = 255 - pa * 3
+	out[a, 1] = pa * 3
+	out[b, 1] = 255 - pb * 3
+	out[b, 2] = pb * 3
+	out[c, 0] = pc * 3
+	out[c, 2] = 255 - pc * 3
+	return _to_u8(out)
+
+
+def rainbow_frame(num: int, pos: int) -> np.ndarray:
+	"""Same layout as the old per-pixel loop: wheel((i * 256 // num + pos) & 255)."""
+	idx = (np.arange(num, dtype=np.int32) * 256 // num + pos) & 255
+	return wheel_array(idx)
+
+
+def wave_frame(num: int, base, wavelength: float, phase: float) -> np.ndarray:
+	"""Sine intensity wave: base * (sin((i + phase) * 2pi / wavelength) + 1) / 2."""
+	i = np.arange(num, dtype=np.float64)
+	s = (np.sin((i + phase) * 2 * np.pi / wavelength) + 1) / 2
+	return _to_u8(s[:, None] * np.asarray(base, dtype=np.float64)[None, :])
+
+
+def bounce_frame(num: int, color, tail: int, idx: int, direction: int) -> np.ndarray:
+	"""Dot at idx with a tail trailing behind it (opposite to direction)."""
+	frame = empty(num)
+	if tail <= 0:
+		return frame
+	t = np.arange(tail, dtype=np.int32)
+	j = idx - t * direction
+	keep = (j >= 0) & (j < num)
+	fade = np.maximum(0.0, 1 - t[keep] / tail).astype(np.float64)
+	frame[j[keep]] = _to_u8(fade[:, None] * np.asarray(color, dtype=np.float64)[None, :])
+	return frame
+
+
+def band_layout(num: int, bands: int):
+	"""Pixel -> band index (low frequencies first) and a hue per pixel for spectrum_frame()."""
+	band_of = np.arange(num) * bands // num
+	colors = wheel_array(band_of * 170 // max(1, bands - 1)).astype(np.float32)
+	return band_of, colors
+
+
+def spectrum_frame(colors: np.ndarray, band_of: np.ndarray, levels: np.ndarray) -> np.ndarray:
+	"""Each pixel's color scaled by the level (0..1) of the band it shows."""
+	return _to_u8(colors * np.asarray(levels, dtype=np.float32)[band_of][:, None])
+
+
+# ---------- compositing ----------
+BLEND_MODES = ("alpha", "over", "add", "max")
+
+
+def composite(base: np.ndarray, top: np.ndarray, mode: str = "alpha", alpha: float = 1.0) -> np.ndarray:
+	"""
+	Blend top onto base (both (num, 4) uint8), scaled by alpha 0..1:
+	alpha: lerp base -> top
+	over: top is premultiplied, its brightest channel is its own alpha (black = see-through)
+	add: saturating add
+	max: per-channel lighten
+	"""
+	if alpha <= 0.0:
+		return base
+	a = min(1.0, float(alpha))
+	b = base.astype(np.float32)
+	t = top.astype(np.float32)
+	if mode == "alpha":
+		out = b + (t - b) * a
+	elif mode == "over":
+		coverage = (t.max(axis=1, keepdims=True) / 255.0) * a
+		out = b * (1.0 - coverage) + t * a
+	elif mode == "add":
+		out = b + t * a
+	elif mode == "max":
+		out = np.maximum(b, t * a)
+	else:
+		raise ValueError(f"unknown blend mode: {mode}")
+	return _to_u8(out + 0.5)
+
+
+# ---------- cycle tables (one full period of a looping mode) ----------
+def rainbow_steps(step: int) -> int:
+	"""How many frames rainbow_cycle(num, step) has."""
+	step = int(step) & 255
+	return 256 // gcd(step, 256) if step else 1
+
+
+def rainbow_cycle(num: int, step: int) -> np.ndarray:
+	"""Frames for pos = 0, step, 2*step, ... until pos wraps back to 0."""
+	step = int(step) & 255
+	return np.stack([rainbow_frame(num, (k * step) & 255) for k in range(rainbow_steps(step))])
+
+
+def wave_cycle(num: int, base, wavelength: int) -> np.ndarray:
+	"""Frames for phase = 0 .. wavelength-1 (phase advances by 1 per frame)."""
+	return np.stack([wave_frame(num, base, wavelength, k) for k in range(int(wavelength))])
+
+
+def solid_colors(colors: np.ndarray) -> np.ndarray:
+	"""(n, 4) per-frame colors -> (n, 4) uint8 (truncated like int(v))."""
+	return _to_u8(np.trunc(colors))
+
+
+def pulse_colors(color) -> np.ndarray:
+	"""61 steps up, 61 steps down (t = i / 60), like the old pulse loop; one color per step."""
+	ts = [i / 60.0 for i in range(61)] + [i / 60.0 for i in range(60, -1, -1)]
+	t = np.asarray(ts, dtype=np.float64)[:, None]
+	return solid_colors(np.asarray(color, dtype=np.float64)[None, :] * t)
+
+
+def fade_colors(c1, c2, period: float, max_frames: int = 20000) -> Optional[np.ndarray]:
+	"""One back-and-forth of fade_between (same t stepping as the old loop); one color per step."""
+	ts = []
+	t, direction = 0.0, 1
+	step = 1 / 60.0
+	while len(ts) <= max_frames:
+		ts.append(t)
+		t += direction * step / (period / 2.0)
+		if t >= 1.0:
+			t, direction = 1.0, -1
+		elif t <= 0.0:
+			t, direction = 0.0, 1
+		if t == 0.0 and direction == 1:
+			break
+	else:
+		return None # period too long to be worth a table
+
+	a = np.asarray(c1, dtype=np.float64)[None, :]
+	b = np.asarray(c2, dtype=np.float64)[None, :]
+	t = np.asarray(ts, dtype=np.float64)[:, None]
+	return solid_colors(a + (b - a) * t)
+
+
+class FrameCache:
+	"""LRU of cycle tables keyed by (mode, args..., num), capped by total bytes."""
+
+	def __init__(self, max_bytes: int = 8 * 1024 * 1024):
+		self.max_bytes = max_bytes
+		self._tables: "OrderedDict[tuple, np.ndarray]" = OrderedDict()
+		self._bytes = 0
+		self._lock = threading.Lock()
+		self.hits = 0
+		self.misses = 0
+
+	def get(self, key: tuple, build) -> Optional[np.ndarray]:
+		"""Return the table for key, calling build() once on a miss (None if it won't fit)."""
+		with self._lock:
+			table = self._tables.get(key)
+			if table is not None:
+				self._tables.move_to_end(key)
+				self.hits += 1
+				return table
+			self.misses += 1
+
+		table = build()
+		if table is None:
+			return None
+		table.setflags(write=False)
+		if table.nbytes > self.max_bytes:
+			return None # too big to keep: the caller renders live instead
+
+		with self._lock:
+			if key not in self._tables:
+				self._tables[key] = table
+				self._bytes += table.nbytes
+			while self._bytes > self.max_bytes and self._tables:
+				_, old = self._tables.popitem(last=False)
+				self._bytes -= old.nbytes
+		return table
+
+	def clear(self):
+		with self._lock:
+			self._tables.clear()
+			self._bytes = 0
+
+	def stats(self) -> dict:
+		with self._lock:
+			return {
+				"tables": len(self._tables),
+				"bytes": self._bytes,
+				"max_bytes": self.max_bytes,
+				"hits": self.hits,
+				"misses": self.misses,
+			}
+
+
+# shared by every Lights instance
+cache = FrameCache()
+
+
+# ---------- color correction ----------
+_CHANNEL_INDEX = np.arange(CHANNELS)[None, :]
+
+
+def build_lut(brightness: float = 1.0, gamma: float = 1.0, white_balance=(1.0, 1.0, 1.0, 1.0)) -> np.ndarray:
+	"""
+	(4, 256) uint8 table per channel folding gamma, global brightness and
+	white balance: out = round(255 * (v / 255) ** gamma * brightness * wb[ch]).
+	"""
+	x = (np.arange(256, dtype=np.float64) / 255.0) ** float(gamma)
+	gains = np.asarray(white_balance, dtype=np.float64)[:, None] * float(brightness)
+	return _to_u8(np.rint(x[None, :] * gains * 255.0))
+
+
+def apply_lut(lut: np.ndarray, frame: np.ndarray) -> np.ndarray:
+	"""Map a whole (num, 4) frame through the per-channel table in one indexing op."""
+	return lut[_CHANNEL_INDEX, frame]
+
+
+# ---------- output ----------
+def write_frame(pixels, frame: np.ndarray):
+	"""Hand a whole frame to the strip in one slice assignment (no show())."""
+	pixels[0:len(frame)] = [tuple(p) for p in frame.tolist()]
+
+
+# ---------- wire format ----------
+def channel_order(order) -> tuple:
+	"""Pixel order like "GRBW" (neopixel.GRBW) -> RGBW channel index of each wire byte."""
+	return tuple("RGBW".index(c) for c in str(order or "RGBW").upper())
+
+
+def wire_view(pixels, num: int, bpp: int = CHANNELS) -> Optional[np.ndarray]:
+	"""
+	Writable (num, bytes per pixel) uint8 view of the driver's transmit buffer,
+	or None if this driver doesn't expose one we can safely write. Only valid
+	while the driver's own brightness is 1.0 (show() then sends it as is).
+	"""
+	buf = getattr(pixels, "buf", None) # lights_sim.VirtualStrip
+	offset = 0
+	if buf is None and getattr(pixels, "_pre_brightness_buffer", None) is None:
+		buf = getattr(pixels, "_post_brightness_buffer", None) # adafruit_pixelbuf (NeoPixel)
+		offset = getattr(pixels, "_offset", 0)
+	if not isinstance(buf, bytearray) or len(buf) < offset + num * bpp:
+		return None
+	return np.frombuffer(buf, dtype=np.uint8, count=num * bpp, offset=offset).reshape(num, bpp)
+
+
+def encode_wire(wire_lut: np.ndarray, order: tuple, frame: np.ndarray, out: np.ndarray):
+	"""
+	Color-correct frame and write it into out in wire byte order in one
+	vectorized step. wire_lut is the (4, 256) LUT with rows already in wire
+	order (lut[list(order)]).
+	"""
+	out[:] = wire_lut[_CHANNEL_INDEX[:, :len(order)], frame[:, order]]
@@ -0,0 +1,87 @@
+import time
+from collections import deque
+from typing import List, Optional, Tuple
+
+import numpy as np
+
+from lights_frames import channel_order
+
+
+class VirtualStrip:
+	"""
+	Stand-in for neopixel.NeoPixel with the same fill / [] / show / brightness
+	surface. Every show() records (timestamp, frame) into a bounded ring buffer
+	so the real Lights class can run and be measured without hardware.
+	Like the driver, pixels live in a bytearray in wire order (`buf`,
+	pixel_order e.g. "GRBW"); captured frames are decoded back to RGBW.
+	"""
+
+	def __init__(self, n: int, brightness: float = 1.0, auto_write: bool = False,
+			pixel_order=None, capacity: int = 1024, clock=time.monotonic):
+		self.n = n
+		self.brightness = brightness
+		self.auto_write = auto_write
+		self.pixel_order = pixel_order or "RGBW"
+		self._order = list(channel_order(self.pixel_order))
+		self.buf = bytearray(n * len(self._order))
+		self._wire = np.frombuffer(self.buf, dtype=np.uint8).reshape(n, len(self._order))
+		self._clock = clock
+		self.captured: "deque[Tuple[float, np.ndarray]]" = deque(maxlen=capacity)
+		self.shows = 0
+
+	# ---------- neopixel surface ----------
+	def __len__(self) -> int:
+		return self.n
+
+	def _decode(self, wire: np.ndarray) -> np.ndarray:
+		out = np.zeros(wire.shape[:-1] + (4,), dtype=np.uint8)
+		out[..., self._order] = wire
+		return out
+
+	def _encode(self, rgbw) -> np.ndarray:
+		return np.clip(np.asarray(rgbw, dtype=np.int32), 0, 255)[..., self._order]
+
+	def __getitem__(self, index):
+		if isinstance(index, slice):
+			return [tuple(p) for p in self._decode(self._wire[index]).tolist()]
+		return tuple(self._decode(self._wire[index]).tolist())
+
+	def __setitem__(self, index, value):
+		if isinstance(index, slice):
+			self._wire[index] = self._encode(np.asarray(list(value)).reshape(-1, 4))
+		else:
+			self._wire[index] = self._encode(value)
+		if self.auto_write:
+			self.show()
+
+	def fill(self, color):
+		self._wire[:] = self._encode(color)
+		if self.auto_write:
+			self.show()
+
+	def show(self):
+		"""Capture what the strip would light up (driver brightness applied)."""
+		frame = self._decode(self._wire)
+		if self.brightness != 1.0:
+			frame = (frame * float(self.brightness)).astype(np.uint8)
+		self.captured.append((self._clock(), frame))
+		self.shows += 1
+
+	# ---------- capture ----------
+	def frames(self) -> List[np.ndarray]:
+		return [f for _, f in self.captured]
+
+	def timestamps(self) -> List[float]:
+		return [t for t, _ in self.captured]
+
+	def last_frame(self) -> Optional[np.ndarray]:
+		return self.captured[-1][1] if self.captured else None
+
+	def frame_intervals(self) -> List[float]:
+		"""Seconds between consecutive captured show() calls."""
+		ts = self.timestamps()
+		return [b - a for a, b in zip(ts, ts[1:])]
+
+	def clear(self):
+		self.captured.clear()
+		self.shows = 0
@@ -0,0 +1,150 @@
+import json
+import math
+
+import numpy as np
+
+import lights_frames as frames
+
+# Timeline spec (plain JSON, so it can come straight from /lights/mode):
+# {
+# 	"keyframes": [
+# 		{"at": 0.0, "color": [255, 0, 0, 0]},
+# 		{"at": 2.0, "color": [0, 0, 255, 0], "ease": "in_out"}, # ease = how we get *to* this keyframe
+# 	],
+# 	"duration": 2.5, # optional, default = last "at"; the last color holds until then
+# 	"loop": false,
+# 	"fps": 60, # compile rate (steps per second)
+# }
+
+EASINGS = {
+	"linear": lambda u: u,
+	"in": lambda u: u * u,
+	"out": lambda u: 1 - (1 - u) * (1 - u),
+	"in_out": lambda u: (1 - np.cos(np.pi * u)) / 2,
+	"step": lambda u: np.where(u >= 1.0 - 1e-9, 1.0, 0.0), # hold, then jump at the keyframe
+}
+
+MAX_FRAMES = 60 * 60 * 10 # 10 minutes at 60 fps is plenty for one cycle (4 bytes a frame)
+
+
+def normalize(spec: dict) -> dict:
+	"""Validate a timeline spec and fill in defaults; raises ValueError on bad input."""
+	if not isinstance(spec, dict):
+		raise ValueError("timeline must be an object")
+	raw = spec.get("keyframes")
+	if not isinstance(raw, list) or not raw:
+		raise ValueError("timeline needs a non-empty keyframes list")
+
+	keys = []
+	for k in raw:
+		color = [int(v) for v in k.get("color", ())]
+		if len(color) == 3:
+			color.append(0)
+		if len(color) != 4:
+			raise ValueError(f"keyframe color must be [r,g,b] or [r,g,b,w]: {k}")
+		ease = k.get("ease", "linear")
+		if ease not in EASINGS:
+			raise ValueError(f"unknown ease {ease!r} (one of {', '.join(EASINGS)})")
+		at = float(k.get("at", 0.0))
+		if not math.isfinite(at): # JSON from Flask may carry NaN / Infinity
+			raise ValueError(f"keyframe at must be a finite number of seconds: {k}")
+		keys.append({"at": max(0.0, at), "color": color, "ease": ease})
+	keys.sort(key=lambda k: k["at"])
+	if keys[0]["at"] > 0.0:
+		keys.insert(0, dict(keys[0], at=0.0))
+
+	fps = float(spec.get("fps", 60))
+	if not 0 < fps <= 1000:
+		raise ValueError("fps must be > 0 and <= 1000")
+	duration = float(spec.get("duration", keys[-1]["at"]))
+	if not math.isfinite(duration):
+		raise ValueError("duration must be a finite number of seconds")
+	duration = max(duration, keys[-1]["at"])
+	if duration * fps > MAX_FRAMES:
+		raise ValueError("timeline too long")
+
+	return {"keyframes": keys, "duration": duration, "loop": bool(spec.get("loop", False)), "fps": fps}
+
+
+def cache_key(spec: dict) -> str:
+	return json.dumps(spec, sort_keys=True)
+
+
+def compile_colors(spec: dict) -> np.ndarray:
+	"""(n, 4) color per step for a normalized spec."""
+	keys = spec["keyframes"]
+	fps = spec["fps"]
+	# a one-shot also shows its final keyframe; a loop's last step wraps to step 0
+	n = int(round(spec["duration"] * fps))
+	n = max(1, n if spec["loop"] else n + 1)
+	t = np.arange(n, dtype=np.float64) / fps
+
+	ats = np.array([k["at"] for k in keys], dtype=np.float64)
+	cols = np.array([k["color"] for k in keys], dtype=np.float64)
+	if len(keys) == 1:
+		return np.repeat(cols, n, axis=0)
+
+	seg = np.clip(np.searchsorted(ats, t, side="right") - 1, 0, len(keys) - 2)
+	span = ats[seg + 1] - ats[seg]
+	u = np.where(span > 0, (t - ats[seg]) / np.where(span > 0, span, 1.0), 1.0)
+	u = np.clip(u, 0.0, 1.0)
+
+	names = list(EASINGS)
+	ease_of = np.array([names.index(k["ease"]) for k in keys])[seg + 1] # easing into the segment's end
+	eased = np.empty_like(u)
+	for i, fn in enumerate(EASINGS.values()):
+		mask = ease_of == i
+		if mask.any():
+			eased[mask] = fn(u[mask])
+	a, b = cols[seg], cols[seg + 1]
+	return a + (b - a) * eased[:, None]
+
+
+def compile_timeline(spec: dict) -> np.ndarray:
+	"""
+	(n, 4) uint8 color table for a normalized spec; step interval is 1 / spec["fps"].
+	Timelines are whole-strip colors, so the table doesn't grow with the pixel count
+	(lights_engine.SolidCycle broadcasts each row when it is drawn).
+	"""
+	return frames.solid_colors(compile_colors(spec))
+
+
+# ---------- built-in cues as data ----------
+def heart(red: int = 255) -> dict:
+	"""Dun-dun: 5 x 50 ms steps per beat, 120 ms between beats."""
+	beat = (0.0, 0.4, 1.0, 0.4, 0.0)
+	keys = []
+	for start in (0.0, 0.37):
+		for i, t in enumerate(beat):
+			keys.append({"at": start + i * 0.05, "color": [int(red * t), 0, 0, 0], "ease": "step"})
+	return {"keyframes": keys, "duration": 0.62, "fps": 100}
+
+
+def override_burn(seconds: float) -> dict:
+	"""Red -> Purple -> Blue, linear, over ~seconds."""
+	half = max(1, int(seconds)) / 2.0
+	return {"keyframes": [
+		{"at": 0.0, "color": [255, 0, 0, 0]},
+		{"at": half, "color": [128, 0, 180, 0]},
+		{"at": 2 * half, "color": [0, 0, 255, 0]},
+	], "fps": 60}
+
+
+def storm() -> dict:
+	"""Blue base; every 1.7 s two white flashes (40 ms on, 60 ms off)."""
+	blue, white = [0, 40, 150, 0], [255, 255, 255, 60]
+	return {"keyframes": [
+		{"at": 0.0, "color": white},
+		{"at": 0.04, "color": blue, "ease": "step"},
+		{"at": 0.10, "color": white, "ease": "step"},
+		{"at": 0.14, "color": blue, "ease": "step"},
+	], "duration": 1.7, "loop": True, "fps": 100}
+
+
+def beat_flash(color, amplitude: float, beat_sec: float) -> dict:
+	"""Flash color * amplitude for the first 20% of each beat, dark for the rest."""
+	on = [int(v * amplitude) for v in color]
+	return {"keyframes": [
+		{"at": 0.0, "color": on},
+		{"at": beat_sec * 0.2, "color": [0, 0, 0, 0], "ease": "step"},
+	], "duration": beat_sec, "loop": True, "fps": 5.0 / beat_sec}
@@ -5,7 +5,8 @@ from datetime import datetime, timedelta
 import json
 import random
 from reminders import reminders
-from app import get_override_message
+from app import get_override_message, load_poems, load_reminders
+from json_store import store
 from config import get_ngrok_url
 import io
 from PIL import Image, ImageTk
@@ -210,8 +211,10 @@ def rotate_poem():
 		return
 
 	try:
-		with open("poems.json", "r", encoding="utf-8") as f:
-			data = json.load(f)
+		data = load_poems() # same backend as the web app (JSON or SQLite)
+		if not data:
+			# the backend only reads the list format: an old dict-shaped poems.json comes back empty
+			data = store.get("poems.json", [])
 
 		# Support both formats:
 		# - new/your current format: list of {text, author, display}
@@ -232,10 +235,8 @@ def rotate_poem():
 
 	# === GET ACTIVE REMINDERS ===
 	try:
-		with open("/home/pi/smartmirror/reminders.json", "r") as f:
-			reminder_data = json.load(f)
-			num_reminders = len(reminder_data)
-	except:
+		num_reminders = len(load_reminders()) # same backend as the web app (JSON or SQLite)
+	except Exception:
 		num_reminders = 0
 
 	# === ESTIMATE SPACE USED ===
@@ -292,8 +293,8 @@ def fade_in_poem(new_poem, step=0):
 	if step > 10:
 		return
 	if step == 0:
-		with open("current_poem.json", "w", encoding="utf-8") as f:
-			json.dump({"text": text.strip(), "author": author.strip()}, f)
+		# atomic, so the web app never reads a half-written poem
+		store.save("current_poem.json", {"text": text.strip(), "author": author.strip()})
 
 	if override_active:
 		label_poem.config(
@@ -0,0 +1,431 @@
+"""
+Where the web app keeps poems, reminders, the favorites/removed logs and the
+miss-you counter. Two backends with the same methods:
+
+	JsonStorage - the original JSON files (default; what the mirror reads)
+	SqliteStorage - one SQLite database in WAL mode, per-row updates
+
+Pick one with SMARTMIRROR_STORAGE ("json" or "sqlite:/path/to/mirror.db").
+Move existing data over once with:
+
+	python storage.py migrate mirror.db
+
+and tidy the append-only files (history logs, tap journal) from cron with:
+
+	python storage.py compact
+"""
+import argparse
+import json
+import os
+import sqlite3
+import threading
+import time
+from typing import Iterator, Optional
+
+from json_store import store
+from jsonl_log import JsonlLog
+from tap_journal import TapJournal, parse_ring, read_state, ring_iso
+
+STORAGE_URL = os.environ.get("SMARTMIRROR_STORAGE", "json")
+
+LOG_KINDS = ("favorites", "removed")
+RING_EVERY = 10 # clicks per ring (and heartbeat)
+MAX_RINGS = int(os.environ.get("SMARTMIRROR_MAX_RINGS", 200)) # ring history kept
+
+
+def _same_poem(p: dict, text: str, author: str) -> bool:
+	return p.get("text", "").strip() == text and p.get("author", "").strip() == author
+
+
+# ---------- JSON files ----------
+def _is_list(d) -> bool:
+	return isinstance(d, list)
+
+
+class JsonStorage:
+	"""Whole-file JSON documents, cached and written atomically via json_store."""
+
+	def __init__(self, poems: str = "poems.json", reminders: str = "reminders.json",
+			favorites: str = "favorites.json", removed: str = "removed.json", missyou: str = "missyou.json"):
+		self.poems_file = poems
+		self.reminders_file = reminders
+		# append-only JSON Lines next to the old arrays (favorites.json -> favorites.jsonl)
+		self.logs = {kind: JsonlLog(os.path.splitext(path)[0] + ".jsonl", legacy=path)
+			for kind, path in (("favorites", favorites), ("removed", removed))}
+		self.missyou_file = missyou
+		self._taps = TapJournal(missyou) # taps append to missyou.json.journal
+		self._lock = threading.Lock() # read-modify-write within this process
+
+	# poems
+	def poems(self) -> list:
+		return list(store.get(self.poems_file, [], check=_is_list))
+
+	def add_poem(self, text: str, author: str, display: bool = True) -> int:
+		with self._lock:
+			poems = self.poems()
+			poems.append({"text": text, "author": author, "display": display})
+			store.save(self.poems_file, poems, ensure_ascii=False, indent=2)
+			return len(poems)
+
+	def hide_poem(self, text: str, author: str) -> bool:
+		"""display=False on the first poem matching text/author; False if none did."""
+		with self._lock:
+			poems = self.poems()
+			for i, p in enumerate(poems):
+				if _same_poem(p, text, author):
+					poems[i] = dict(p, display=False)
+					store.save(self.poems_file, poems, ensure_ascii=False, indent=2)
+					return True
+			return False
+
+	# reminders (addressed by list index, like the UI)
+	def reminders(self) -> list:
+		return list(store.get(self.reminders_file, [], check=_is_list))
+
+	def _edit_reminders(self, edit):
+		with self._lock:
+			reminders = self.reminders()
+			result = edit(reminders)
+			store.save(self.reminders_file, reminders)
+			return result
+
+	def add_reminder(self, value):
+		self._edit_reminders(lambda r: r.append(value))
+
+	def set_reminder(self, index: int, value):
+		"""Raises IndexError if there is no such reminder."""
+		def _set(r):
+			r[index] = value
+		self._edit_reminders(_set)
+
+	def delete_reminder(self, index: int):
+		"""Remove and return the reminder at index; raises IndexError."""
+		return self._edit_reminders(lambda r: r.pop(index))
+
+	# favorites / removed history
+	def log(self, kind: str, entry):
+		self.logs[kind].append(entry)
+
+	def iter_log(self, kind: str) -> Iterator:
+		"""Entries oldest first, streamed."""
+		return iter(self.logs[kind])
+
+	def log_page(self, kind: str, offset: int = 0, limit: int = 50) -> list:
+		return self.logs[kind].page(offset, limit)
+
+	def log_entries(self, kind: str) -> list:
+		return list(self.logs[kind])
+
+	def compact(self) -> dict:
+		"""Drop torn lines from the history logs and fold the tap journal into missyou.json."""
+		counts = {kind: log.compact() for kind, log in self.logs.items()}
+		self._taps.compact(MAX_RINGS)
+		return counts
+
+	# miss you
+	def missyou(self) -> dict:
+		"""Always a dict with keys: clicks (int), rings (list of ISO UTC strings)."""
+		return self._taps.state(MAX_RINGS)
+
+	def tap(self, every: int = RING_EVERY, keep: int = MAX_RINGS):
+		"""One click: returns (clicks, ring count, whether this click added a ring)."""
+		return self._taps.tap(every, keep)
+
+	def ring_count(self, start: float, end: Optional[float] = None) -> int:
+		"""Rings at epoch seconds in [start, end) (open-ended if end is None)."""
+		return self._taps.count(start, end, MAX_RINGS)
+
+	def rings(self, start: Optional[float] = None, end: Optional[float] = None) -> list:
+		"""ISO timestamps of the rings in [start, end), oldest first."""
+		return self._taps.between(start, end, MAX_RINGS)
+
+
+class JsonFiles:
+	"""
+	Read-only view of the JSON files, the source for migrate: history arrays
+	not yet moved to .jsonl are read in place and the tap journal is replayed
+	without taking its lock, so nothing in the folder is renamed or created.
+	"""
+
+	def __init__(self, poems: str = "poems.json", reminders: str = "reminders.json",
+			favorites: str = "favorites.json", removed: str = "removed.json", missyou: str = "missyou.json"):
+		self.poems_file = poems
+		self.reminders_file = reminders
+		self.logs = {kind: JsonlLog(os.path.splitext(path)[0] + ".jsonl", legacy=path)
+			for kind, path in (("favorites", favorites), ("removed", removed))}
+		self.missyou_file = missyou
+
+	def poems(self) -> list:
+		return list(store.get(self.poems_file, [], check=_is_list))
+
+	def reminders(self) -> list:
+		return list(store.get(self.reminders_file, [], check=_is_list))
+
+	def log_entries(self, kind: str) -> list:
+		return list(self.logs[kind].peek())
+
+	def missyou(self) -> dict:
+		return read_state(self.missyou_file, MAX_RINGS)
+
+
+# ---------- SQLite ----------
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS poems (
+	id INTEGER PRIMARY KEY,
+	text TEXT NOT NULL,
+	author TEXT NOT NULL,
+	display INTEGER NOT NULL DEFAULT 1
+);
+CREATE INDEX IF NOT EXISTS poems_text_author ON poems (text, author);
+CREATE TABLE IF NOT EXISTS reminders (
+	id INTEGER PRIMARY KEY,
+	value TEXT NOT NULL -- JSON
+);
+CREATE TABLE IF NOT EXISTS log (
+	id INTEGER PRIMARY KEY,
+	kind TEXT NOT NULL,
+	entry TEXT NOT NULL -- JSON
+);
+CREATE INDEX IF NOT EXISTS log_kind ON log (kind, id);
+CREATE TABLE IF NOT EXISTS counters (
+	name TEXT PRIMARY KEY,
+	value INTEGER NOT NULL
+);
+CREATE TABLE IF NOT EXISTS rings (
+	id INTEGER PRIMARY KEY,
+	at TEXT NOT NULL, -- ISO UTC, "...Z"
+	ts INTEGER -- epoch seconds, for range queries
+);
+"""
+_RINGS_TS = """
+CREATE INDEX IF NOT EXISTS rings_ts ON rings (ts);
+"""
+
+
+class SqliteStorage:
+	"""
+	Same methods as JsonStorage on one SQLite file in WAL mode: readers never
+	block the writer, each change touches only its rows, and every write is a
+	transaction, so concurrent gunicorn workers can't clobber each other.
+	Statements are constant strings, so sqlite3's statement cache reuses them.
+	"""
+
+	def __init__(self, path: str):
+		self.path = path
+		self._local = threading.local() # one connection per thread
+		with self._db() as db:
+			db.executescript(_SCHEMA)
+			if "ts" not in [c[1] for c in db.execute("PRAGMA table_info(rings)")]: # made before ts existed
+				db.execute("ALTER TABLE rings ADD COLUMN ts INTEGER")
+				db.executemany("UPDATE rings SET ts = ? WHERE id = ?",
+					[(parse_ring(at), rid) for rid, at in db.execute("SELECT id, at FROM rings").fetchall()])
+			db.executescript(_RINGS_TS)
+
+	def _db(self) -> sqlite3.Connection:
+		db = getattr(self._local, "db", None)
+		if db is None or self._local.pid != os.getpid(): # not across a fork
+			db = sqlite3.connect(self.path, timeout=5.0, isolation_level=None, check_same_thread=False)
+			db.execute("PRAGMA journal_mode=WAL")
+			db.execute("PRAGMA synchronous=NORMAL") # durable at checkpoints; WAL keeps it consistent
+			db.execute("PRAGMA busy_timeout=5000")
+			self._local.db, self._local.pid = db, os.getpid()
+		return db
+
+	def _write(self):
+		"""BEGIN IMMEDIATE ... COMMIT: take the write lock up front so read-then-write can't race."""
+		return _Transaction(self._db())
+
+	# poems
+	def poems(self) -> list:
+		rows = self._db().execute("SELECT text, author, display FROM poems ORDER BY id")
+		return [{"text": t, "author": a, "display": bool(d)} for t, a, d in rows]
+
+	def add_poem(self, text: str, author: str, display: bool = True) -> int:
+		with self._write() as db:
+			db.execute("INSERT INTO poems (text, author, display) VALUES (?, ?, ?)", (text, author, int(display)))
+			return db.execute("SELECT COUNT(*) FROM poems").fetchone()[0]
+
+	def hide_poem(self, text: str, author: str) -> bool:
+		with self._write() as db:
+			row = db.execute("SELECT id FROM poems WHERE text = ? AND author = ? ORDER BY id LIMIT 1",
+				(text, author)).fetchone()
+			if row is None:
+				# stored values may carry whitespace the UI strips; fall back to a scan
+				for pid, t, a in db.execute("SELECT id, text, author FROM poems ORDER BY id"):
+					if t.strip() == text and a.strip() == author:
+						row = (pid,)
+						break
+			if row is None:
+				return False
+			db.execute("UPDATE poems SET display = 0 WHERE id = ?", row)
+			return True
+
+	# reminders
+	def reminders(self) -> list:
+		return [json.loads(v) for (v,) in self._db().execute("SELECT value FROM reminders ORDER BY id")]
+
+	def _reminder_id(self, db, index: int) -> int:
+		if index < 0:
+			row = db.execute("SELECT id FROM reminders ORDER BY id DESC LIMIT 1 OFFSET ?", (-index - 1,)).fetchone()
+		else:
+			row = db.execute("SELECT id FROM reminders ORDER BY id LIMIT 1 OFFSET ?", (index,)).fetchone()
+		if row is None:
+			raise IndexError("reminder index out of range")
+		return row[0]
+
+	def add_reminder(self, value):
+		with self._write() as db:
+			db.execute("INSERT INTO reminders (value) VALUES (?)", (json.dumps(value),))
+
+	def set_reminder(self, index: int, value):
+		with self._write() as db:
+			db.execute("UPDATE reminders SET value = ? WHERE id = ?", (json.dumps(value), self._reminder_id(db, index)))
+
+	def delete_reminder(self, index: int):
+		with self._write() as db:
+			rid = self._reminder_id(db, index)
+			(value,) = db.execute("SELECT value FROM reminders WHERE id = ?", (rid,)).fetchone()
+			db.execute("DELETE FROM reminders WHERE id = ?", (rid,))
+			return json.loads(value)
+
+	# favorites / removed history
+	def log(self, kind: str, entry):
+		if kind not in LOG_KINDS:
+			raise KeyError(kind)
+		with self._write() as db:
+			db.execute("INSERT INTO log (kind, entry) VALUES (?, ?)", (kind, json.dumps(entry, ensure_ascii=False)))
+
+	def iter_log(self, kind: str) -> Iterator:
+		for (e,) in self._db().execute("SELECT entry FROM log WHERE kind = ? ORDER BY id", (kind,)):
+			yield json.loads(e)
+
+	def log_page(self, kind: str, offset: int = 0, limit: int = 50) -> list:
+		rows = self._db().execute("SELECT entry FROM log WHERE kind = ? ORDER BY id LIMIT ? OFFSET ?",
+			(kind, max(0, limit), max(0, offset)))
+		return [json.loads(e) for (e,) in rows]
+
+	def log_entries(self, kind: str) -> list:
+		return list(self.iter_log(kind))
+
+	def compact(self) -> dict:
+		"""Fold the WAL back into the database file."""
+		self._db().execute("PRAGMA wal_checkpoint(TRUNCATE)")
+		return {}
+
+	# miss you
+	def missyou(self) -> dict:
+		db = self._db()
+		row = db.execute("SELECT value FROM counters WHERE name = 'clicks'").fetchone()
+		rings = [at for (at,) in db.execute("SELECT at FROM rings ORDER BY id")]
+		return {"clicks": row[0] if row else 0, "rings": rings}
+
+	def tap(self, every: int = RING_EVERY, keep: int = MAX_RINGS):
+		with self._write() as db:
+			db.execute("INSERT INTO counters (name, value) VALUES ('clicks', 1) "
+				"ON CONFLICT (name) DO UPDATE SET value = value + 1")
+			clicks = db.execute("SELECT value FROM counters WHERE name = 'clicks'").fetchone()[0]
+			ring = clicks % every == 0
+			if ring:
+				now = int(time.time())
+				db.execute("INSERT INTO rings (at, ts) VALUES (?, ?)", (ring_iso(now), now))
+				db.execute("DELETE FROM rings WHERE id <= (SELECT MAX(id) FROM rings) - ?", (keep,))
+			count = db.execute("SELECT COUNT(*) FROM rings").fetchone()[0]
+			return clicks, count, ring
+
+	# range queries walk the rings_ts index: logarithmic in the history kept
+	def ring_count(self, start: float, end: Optional[float] = None) -> int:
+		return self._db().execute("SELECT COUNT(*) FROM rings WHERE ts >= ? AND ts < ?",
+			_bounds(start, end)).fetchone()[0]
+
+	def rings(self, start: Optional[float] = None, end: Optional[float] = None) -> list:
+		rows = self._db().execute("SELECT at FROM rings WHERE ts >= ? AND ts < ? ORDER BY ts", _bounds(start, end))
+		return [at for (at,) in rows]
+
+	# migration
+	def import_from(self, src, replace: bool = False) -> dict:
+		"""
+		Copy everything from another backend (normally JsonStorage) in one
+		transaction. Refuses to touch a database that already has data unless
+		replace=True. Returns row counts.
+		"""
+		data = src.missyou()
+		poems, reminders = src.poems(), src.reminders()
+		logs = {kind: src.log_entries(kind) for kind in LOG_KINDS} # read before we lock the db
+		with self._write() as db:
+			tables = ("poems", "reminders", "log", "counters", "rings")
+			if not replace and any(db.execute(f"SELECT 1 FROM {t} LIMIT 1").fetchone() for t in tables):
+				raise RuntimeError(f"{self.path} already has data (use --replace to overwrite)")
+			for t in tables:
+				db.execute(f"DELETE FROM {t}")
+			db.executemany("INSERT INTO poems (text, author, display) VALUES (?, ?, ?)",
+				[(p.get("text", ""), p.get("author", "Unknown"), int(bool(p.get("display", True)))) for p in poems])
+			db.executemany("INSERT INTO reminders (value) VALUES (?)", [(json.dumps(r),) for r in reminders])
+			for kind, entries in logs.items():
+				db.executemany("INSERT INTO log (kind, entry) VALUES (?, ?)",
+					[(kind, json.dumps(e, ensure_ascii=False)) for e in entries])
+			db.execute("INSERT INTO counters (name, value) VALUES ('clicks', ?)", (int(data["clicks"]),))
+			db.executemany("INSERT INTO rings (at, ts) VALUES (?, ?)", [(at, parse_ring(at)) for at in data["rings"]])
+		counts = {"poems": len(poems), "reminders": len(reminders), "rings": len(data["rings"]), "clicks": data["clicks"]}
+		counts.update({kind: len(e) for kind, e in logs.items()})
+		return counts
+
+
+def _bounds(start: Optional[float], end: Optional[float]) -> tuple:
+	return (float("-inf") if start is None else start, float("inf") if end is None else end)
+
+
+class _Transaction:
+	def __init__(self, db: sqlite3.Connection):
+		self.db = db
+
+	def __enter__(self) -> sqlite3.Connection:
+		self.db.execute("BEGIN IMMEDIATE")
+		return self.db
+
+	def __exit__(self, exc_type, exc, tb):
+		self.db.execute("ROLLBACK" if exc_type else "COMMIT")
+		return False
+
+
+def open_storage(url: Optional[str] = None, **json_files):
+	"""'json' (json_files override the file names) or 'sqlite:/path/to.db'."""
+	url = url or STORAGE_URL
+	if url == "json":
+		return JsonStorage(**json_files)
+	if url.startswith("sqlite:"):
+		return SqliteStorage(url[len("sqlite:"):])
+	raise ValueError(f"unknown storage: {url!r} (use json or sqlite:/path/to.db)")
+
+
+def main(argv=None):
+	ap = argparse.ArgumentParser(description="Storage tools for the mirror's web app.")
+	sub = ap.add_subparsers(dest="cmd", required=True)
+	mig = sub.add_parser("migrate", help="copy the JSON files into an SQLite database (one shot)")
+	mig.add_argument("db", help="SQLite database to create / fill")
+	mig.add_argument("--dir", default=".", help="folder holding poems.json, reminders.json, ...")
+	mig.add_argument("--replace", action="store_true", help="overwrite a database that already has data")
+	comp = sub.add_parser("compact", help="tidy the append-only files (history logs, tap journal) or the WAL")
+	comp.add_argument("--dir", default=".", help="folder holding the JSON files")
+	comp.add_argument("--storage", help="storage URL (default: SMARTMIRROR_STORAGE)")
+	args = ap.parse_args(argv)
+
+	files = [os.path.join(args.dir, name) for name in
+		("poems.json", "reminders.json", "favorites.json", "removed.json", "missyou.json")]
+	if args.cmd == "compact":
+		target = JsonStorage(*files) if (args.storage or STORAGE_URL) == "json" else open_storage(args.storage)
+		counts = target.compact()
+		for kind, c in counts.items():
+			print(f"{kind}: kept {c['kept']}, dropped {c['dropped']} unreadable line(s)")
+		if not counts:
+			print(f"checkpointed {target.path}")
+		return
+	try:
+		counts = SqliteStorage(args.db).import_from(JsonFiles(*files), replace=args.replace)
+	except RuntimeError as e:
+		ap.exit(1, f"{e}\n")
+	print(", ".join(f"{k}: {v}" for k, v in counts.items()))
+	print(f"now run the app with SMARTMIRROR_STORAGE=sqlite:{os.path.abspath(args.db)}")
+
+
+if __name__ == "__main__":
+	main()
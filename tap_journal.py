@@ -0,0 +1,255 @@
+"""
+Miss-you taps as an append-only journal next to the missyou.json snapshot.
+
+A tap appends one fixed-size record (clicks after the tap, ring flag, time)
+instead of rewriting the whole file. State = snapshot + replay of the
+records after it. Every few thousand taps the state is written back as the
+snapshot (same format as before: {"clicks", "rings"}) and the journal starts
+over. Records carry their click count, so a crash between the two steps
+can't count a tap twice.
+
+Taps are serialized across processes (gunicorn workers) with flock on a
+lock file: each process replays what the others appended since its last
+look, then appends, so no increment is lost.
+
+fsync policy (SMARTMIRROR_TAP_FSYNC): "always", "interval" (default: at
+most once a second) or "never" (leave it to the OS).
+"""
+import argparse
+import os
+import struct
+import tempfile
+from bisect import bisect_left, insort
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime, timezone
+from typing import Optional
+
+from json_store import store
+
+try:
+	import fcntl
+except ImportError: # not on Windows; taps are then only atomic within one process
+	fcntl = None
+
+FSYNC = os.environ.get("SMARTMIRROR_TAP_FSYNC", "interval")
+FSYNC_INTERVAL = 1.0
+SNAPSHOT_EVERY = 4096 # records
+
+# u32 clicks after this tap, u8 ring added, f64 unix time
+_RECORD = struct.Struct("<IBd")
+
+
+def ring_iso(sec: float) -> str:
+	return datetime.utcfromtimestamp(int(sec)).isoformat() + "Z"
+
+
+def parse_ring(ts: str) -> Optional[int]:
+	"""ISO UTC ("...Z", "...Z.sss", "...sssZ") -> epoch seconds, or None if unreadable."""
+	try:
+		# accept both "...Z" and "...Z.sss"
+		clean = ts.replace("Z", "").split(".", 1)[0]
+		return int(datetime.fromisoformat(clean).replace(tzinfo=timezone.utc).timestamp())
+	except (AttributeError, ValueError):
+		return None
+
+
+def _count_between(times: list, start: float, end: Optional[float] = None) -> int:
+	"""How many of the sorted times are in [start, end) (no upper bound if end is None)."""
+	hi = len(times) if end is None else bisect_left(times, end)
+	return max(0, hi - bisect_left(times, start))
+
+
+def _replay(data: bytes, clicks: int, times: list) -> int:
+	"""Apply journal records to (clicks, sorted ring times); returns the new click count."""
+	for c, ring, ts in _RECORD.iter_unpack(data):
+		if c <= clicks:
+			continue # already in the snapshot
+		clicks = c
+		if ring:
+			insort(times, int(ts))
+	return clicks
+
+
+def _load_snapshot(snapshot: str) -> tuple:
+	data = store.get(snapshot, check=lambda d: isinstance(d, dict)) or {}
+	return int(data.get("clicks", 0)), sorted(t for t in map(parse_ring, data.get("rings", ())) if t is not None)
+
+
+def read_state(snapshot: str, keep: int) -> dict:
+	"""Snapshot + journal replay without creating, locking or repairing any file (offline tools)."""
+	clicks, times = _load_snapshot(snapshot)
+	try:
+		with open(snapshot + ".journal", "rb") as f:
+			data = f.read()
+	except FileNotFoundError:
+		data = b""
+	clicks = _replay(data[:len(data) - len(data) % _RECORD.size], clicks, times) # skip a torn tail
+	del times[:-keep]
+	return {"clicks": clicks, "rings": [ring_iso(t) for t in times]}
+
+
+class TapJournal:
+	"""Click counter + ring history for one snapshot file; safe across threads and processes."""
+
+	def __init__(self, snapshot: str = "missyou.json", fsync: str = FSYNC):
+		if fsync not in ("always", "interval", "never"):
+			raise ValueError(f"unknown fsync policy: {fsync!r}")
+		self.snapshot = snapshot
+		self.path = snapshot + ".journal"
+		self.fsync = fsync
+		self._lock = threading.Lock()
+		self._lock_fd = None
+		self._fd = None
+		self._ino = None
+		self._pid = None
+		self._offset = 0
+		self._last_sync = 0.0
+		self.clicks = 0
+		self.times = [] # ring times, sorted epoch seconds
+
+	# ---------- files ----------
+	def _open(self):
+		"""(Re)open the journal and rebuild state: snapshot + full replay."""
+		forked = self._pid != os.getpid()
+		if self._fd is not None:
+			os.close(self._fd)
+		parent = os.path.dirname(self.snapshot)
+		if parent:
+			os.makedirs(parent, exist_ok=True)
+		if self._lock_fd is None or forked:
+			# a forked child shares the parent's open file, and with it the flock: get our own
+			if self._lock_fd is not None:
+				os.close(self._lock_fd)
+			self._lock_fd = os.open(self.snapshot + ".lock", os.O_RDWR | os.O_CREAT, 0o644)
+		self._fd = os.open(self.path, os.O_RDWR | os.O_APPEND | os.O_CREAT, 0o644)
+		self._ino = os.fstat(self._fd).st_ino
+		self._pid = os.getpid()
+		self._offset = 0
+
+		self.clicks, self.times = _load_snapshot(self.snapshot)
+
+	def _stale(self) -> bool:
+		if self._fd is None or self._pid != os.getpid():
+			return True
+		try:
+			st = os.stat(self.path)
+		except FileNotFoundError:
+			return True
+		return st.st_ino != self._ino or st.st_size < self._offset # compacted by another process
+
+	def _catch_up(self, keep: int):
+		"""Apply records other processes appended since we last looked (flock held)."""
+		if self._stale():
+			self._open()
+		end = os.fstat(self._fd).st_size
+		torn = end % _RECORD.size
+		if torn: # a writer died mid-record: cut it off, or every later append lands misaligned
+			end -= torn
+			os.ftruncate(self._fd, end)
+			print(f"tap_journal: dropped {torn} torn byte(s) at the end of {self.path}")
+		if end <= self._offset:
+			return
+		self.clicks = _replay(os.pread(self._fd, end - self._offset, self._offset), self.clicks, self.times)
+		del self.times[:-keep]
+		self._offset = end
+
+	@contextmanager
+	def _synced(self, keep: int):
+		"""Hold the cross-process lock with state brought up to date."""
+		with self._lock:
+			if self._stale():
+				self._open()
+			if fcntl is not None:
+				fcntl.flock(self._lock_fd, fcntl.LOCK_EX)
+			try:
+				self._catch_up(keep)
+				yield
+			finally:
+				if fcntl is not None:
+					fcntl.flock(self._lock_fd, fcntl.LOCK_UN)
+
+	# ---------- API ----------
+	def state(self, keep: int) -> dict:
+		with self._synced(keep):
+			return {"clicks": self.clicks, "rings": [ring_iso(t) for t in self.times]}
+
+	def count(self, start: float, end: Optional[float], keep: int) -> int:
+		"""Rings in [start, end): two bisects on the sorted times."""
+		with self._synced(keep):
+			return _count_between(self.times, start, end)
+
+	def between(self, start: Optional[float], end: Optional[float], keep: int) -> list:
+		with self._synced(keep):
+			lo = 0 if start is None else bisect_left(self.times, start)
+			hi = len(self.times) if end is None else bisect_left(self.times, end)
+			return [ring_iso(t) for t in self.times[lo:hi]]
+
+	def tap(self, every: int, keep: int):
+		"""One click: returns (clicks, ring count, whether this click added a ring)."""
+		with self._synced(keep):
+			now = time.time()
+			clicks = self.clicks + 1
+			ring = clicks % every == 0
+			os.write(self._fd, _RECORD.pack(clicks, ring, now))
+			self._offset += _RECORD.size
+			self.clicks = clicks
+			if ring:
+				insort(self.times, int(now)) # at the end unless the clock stepped back
+				del self.times[:-keep]
+			self._sync(now)
+			if self._offset >= SNAPSHOT_EVERY * _RECORD.size:
+				self._compact()
+			return clicks, len(self.times), ring
+
+	def compact(self, keep: int):
+		"""Fold the journal into the snapshot now (e.g. before a backup)."""
+		with self._synced(keep):
+			self._compact()
+
+	def _sync(self, now: float):
+		if self.fsync == "always" or (self.fsync == "interval" and now - self._last_sync >= FSYNC_INTERVAL):
+			os.fsync(self._fd)
+			self._last_sync = now
+
+	def _compact(self):
+		# snapshot first: if we die before the new journal is in place, replay skips
+		# every old record because its click count is already in the snapshot
+		rings = [ring_iso(t) for t in self.times]
+		store.save(self.snapshot, {"clicks": self.clicks, "rings": rings}, ensure_ascii=False, indent=2)
+		tmp = self.path + ".tmp"
+		os.close(os.open(tmp, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o644))
+		os.replace(tmp, self.path)
+		os.close(self._fd)
+		self._fd = os.open(self.path, os.O_RDWR | os.O_APPEND)
+		self._ino = os.fstat(self._fd).st_ino
+		self._offset = 0
+
+
+def _check() -> bool:
+	"""Crash check: tear the last record, tap on, replay from scratch."""
+	with tempfile.TemporaryDirectory() as d:
+		snap = os.path.join(d, "missyou.json")
+		j = TapJournal(snap, fsync="never")
+		for _ in range(20):
+			j.tap(10, 200)
+		os.truncate(j.path, os.path.getsize(j.path) - 6) # died mid-write
+		j = TapJournal(snap, fsync="never")
+		for _ in range(3):
+			j.tap(10, 200)
+		state = TapJournal(snap, fsync="never").state(200)
+		ok = state["clicks"] == 22 and len(state["rings"]) == 2 and os.path.getsize(j.path) % _RECORD.size == 0
+		print(f"replayed {state['clicks']} clicks, {len(state['rings'])} rings: {'ok' if ok else 'FAILED'}")
+		return ok
+
+
+def main(argv=None):
+	ap = argparse.ArgumentParser(description="Tap journal tools.")
+	ap.add_argument("cmd", choices=["check"], help="check: replay a journal with a torn tail")
+	ap.parse_args(argv)
+	raise SystemExit(0 if _check() else 1)
+
+
+if __name__ == "__main__":
+	main()